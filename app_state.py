@@ -0,0 +1,51 @@
+# app_state.py
+# Pieces shared by the process-local stores: where persistent state lives, how channel
+# names are keyed, and the background reaper loop of the in-memory stores.
+
+import asyncio
+import os
+
+STATE_DIR = os.getenv("STATE_DIR", "state")
+
+
+def channel_key(channel: str) -> str:
+    """'@Channel ', 'channel' and 'CHANNEL' are the same channel"""
+    return channel.strip().lstrip('@').lower()
+
+
+class PeriodicReaper:
+    """
+    Calls self.reap() now and then every self.reap_interval seconds until stopped.
+    reap runs in a worker thread unless reap_in_thread is False (state owned by the event loop).
+    """
+    reaper_name = "Reaper"
+    reap_in_thread = True
+    reap_interval = 60
+    _task = None
+
+    def reap(self):
+        raise NotImplementedError
+
+    async def _run(self):
+        while True:
+            try:
+                if self.reap_in_thread:
+                    await asyncio.to_thread(self.reap)
+                else:
+                    self.reap()
+            except Exception as e:
+                print(f"⚠️ {self.reaper_name} error: {e}")
+            await asyncio.sleep(self.reap_interval)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
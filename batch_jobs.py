@@ -0,0 +1,148 @@
+# batch_jobs.py
+# Scheduling batches running as background jobs.
+# The request that starts a job returns its id right away; per-post progress is kept on
+# the job for polling and Server-Sent Events, and finished jobs are kept for
+# JOB_RETENTION_SECONDS so a client that disconnected can still fetch the outcome.
+
+import asyncio
+import json
+import os
+import time
+import uuid
+from datetime import datetime
+from app_state import PeriodicReaper
+
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+JOB_REAP_INTERVAL_SECONDS = int(os.getenv("JOB_REAP_INTERVAL_SECONDS", "60"))
+SSE_KEEPALIVE_SECONDS = 15
+
+
+class BatchJob:
+    def __init__(self, total: int):
+        self.id = uuid.uuid4().hex
+        self.status = "running"
+        self.total = total
+        self.created_at = datetime.now()
+        self.finished_at = None
+        self.finished_monotonic = None
+        self.posts = []
+        self.counts = {"scheduled": 0, "failed": 0, "skipped": 0}
+        self.result = None
+        self.error = None
+        self.task = None
+        self._changed = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status != "running"
+
+    def _notify(self):
+        # Wake every current waiter; later waiters get a fresh event
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def record(self, post: dict):
+        """One post of the batch was handled (scheduled, failed or skipped)"""
+        self.posts.append(post)
+        if post.get("status") in self.counts:
+            self.counts[post["status"]] += 1
+        self._notify()
+
+    def finish(self, result=None, error=None):
+        self.status = "failed" if error else "done"
+        self.result = result
+        self.error = error
+        self.finished_at = datetime.now()
+        self.finished_monotonic = time.monotonic()
+        self._notify()
+
+    async def wait(self, seen: int, timeout: float) -> bool:
+        """Wait until there are more than `seen` posts or the job finished; False on timeout"""
+        if len(self.posts) > seen or self.finished:
+            return True
+        changed = self._changed
+        try:
+            await asyncio.wait_for(changed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def snapshot(self, since: int = 0):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "total": self.total,
+            "done": len(self.posts),
+            **self.counts,
+            "posts": self.posts[since:],
+            "result": self.result,
+            "error": self.error
+        }
+
+    async def events(self, last_event_id: int = -1):
+        """SSE stream: one "post" event per handled post (id = its index), then "done" or "error" """
+        seen = last_event_id + 1
+        while True:
+            while seen < len(self.posts):
+                yield f"id: {seen}\nevent: post\ndata: {json.dumps(self.posts[seen], default=str)}\n\n"
+                seen += 1
+            if self.finished:
+                if self.error:
+                    yield f"event: error\ndata: {json.dumps({'error': self.error})}\n\n"
+                else:
+                    yield f"event: done\ndata: {json.dumps(self.result, default=str)}\n\n"
+                return
+            if not await self.wait(seen, SSE_KEEPALIVE_SECONDS):
+                yield ": keepalive\n\n"
+
+
+class BatchJobManager(PeriodicReaper):
+    reaper_name = "Scheduling job reaper"
+    # Jobs live on the event loop
+    reap_in_thread = False
+
+    def __init__(self, retention_seconds=JOB_RETENTION_SECONDS, reap_interval=JOB_REAP_INTERVAL_SECONDS):
+        self.retention_seconds = retention_seconds
+        self.reap_interval = reap_interval
+        self._jobs = {}
+
+    def submit(self, total: int, run) -> BatchJob:
+        """Start run(job) in the background; its return value becomes the job result"""
+        job = BatchJob(total)
+        self._jobs[job.id] = job
+        job.task = asyncio.create_task(self._run_job(job, run))
+        return job
+
+    async def _run_job(self, job: BatchJob, run):
+        try:
+            job.finish(result=await run(job))
+        except asyncio.CancelledError:
+            job.finish(error="Job cancelled (server shutting down)")
+            raise
+        except Exception as e:
+            print(f"❌ Scheduling job {job.id} failed: {e}")
+            job.finish(error=str(e))
+
+    def get(self, job_id: str):
+        return self._jobs.get(job_id)
+
+    def reap(self) -> int:
+        cutoff = time.monotonic() - self.retention_seconds
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished and job.finished_monotonic < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+        return len(expired)
+
+    def stats(self):
+        running = sum(1 for job in self._jobs.values() if not job.finished)
+        return {"jobs": len(self._jobs), "running": running, "retention_seconds": self.retention_seconds}
+
+    async def stop(self):
+        tasks = [job.task for job in self._jobs.values() if job.task is not None and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await super().stop()
@@ -0,0 +1,127 @@
+# blocked_slots.py
+# In-process index of used time slots per channel and date, built from the channel status worksheets.
+
+import os
+import threading
+import time
+from datetime import datetime, date, timedelta
+from functools import lru_cache
+
+BLOCKED_SLOTS_TTL_SECONDS = int(os.getenv("BLOCKED_SLOTS_TTL_SECONDS", "300"))
+
+# Both logging styles that have been used in the status sheets
+DATE_FORMATS = ["%Y-%m-%d", "%d/%m/%Y", "%Y/%m/%d", "%m/%d/%Y"]
+TIME_FORMATS = ["%H:%M:%S", "%H:%M"]
+
+
+def _parser(formats):
+    """lru-cached parser that tries `formats` in their fixed order (ambiguous dates always read the same way)"""
+
+    @lru_cache(maxsize=8192)
+    def parse(value: str):
+        for fmt in formats:
+            try:
+                return datetime.strptime(value, fmt)
+            except ValueError:
+                continue
+        return None
+
+    return parse
+
+
+parse_sheet_date = _parser(DATE_FORMATS)
+parse_sheet_time = _parser(TIME_FORMATS)
+
+
+class BlockedSlotIndex:
+    """
+    channel_id -> date -> raw time strings, loaded for many channels at once by
+    `fetch_rows(channel_ids)` which must return {channel_id: [[date, time, status], ...]}.
+
+    Only the dates inside a requested window have their times parsed, and slots
+    logged by this process are added incrementally so they block immediately.
+    """
+
+    def __init__(self, fetch_rows, ttl_seconds=BLOCKED_SLOTS_TTL_SECONDS):
+        self._fetch_rows = fetch_rows
+        self.ttl_seconds = ttl_seconds
+        self._by_date = {}     # channel_id -> {date: [time_str, ...]}
+        self._loaded_at = {}   # channel_id -> time.monotonic()
+        self._logged = {}      # channel_id -> {date: set(datetime)} added by this service
+        self._lock = threading.Lock()
+
+    def _is_fresh(self, channel_id) -> bool:
+        loaded_at = self._loaded_at.get(channel_id)
+        return loaded_at is not None and time.monotonic() - loaded_at < self.ttl_seconds
+
+    def _load(self, channel_ids):
+        rows_by_channel = self._fetch_rows(channel_ids)
+        loaded_at = time.monotonic()
+        for channel_id in channel_ids:
+            by_date_str = {}
+            for row in rows_by_channel.get(channel_id, []):
+                date_str, time_str, status = (list(row) + ["", "", ""])[:3]
+                date_str, time_str = str(date_str).strip(), str(time_str).strip()
+                # Any non-empty status means this time slot was used
+                if not date_str or not time_str or not str(status).strip():
+                    continue
+                by_date_str.setdefault(date_str, []).append(time_str)
+
+            # Parse each distinct date string once, not once per row
+            by_date = {}
+            for date_str, times in by_date_str.items():
+                parsed = parse_sheet_date(date_str)
+                if parsed is None:
+                    print(f"⚠️ Could not parse date: {date_str}")
+                    continue
+                by_date.setdefault(parsed.date(), []).extend(times)
+
+            with self._lock:
+                self._by_date[channel_id] = by_date
+                self._loaded_at[channel_id] = loaded_at
+
+    def get(self, channel_ids, start: datetime = None, end: datetime = None):
+        """Blocked naive datetimes for channel_ids, limited to the dates between start and end"""
+        stale = [c for c in channel_ids if not self._is_fresh(c)]
+        if stale:
+            self._load(stale)
+
+        blocked = set()
+        for channel_id in channel_ids:
+            by_date = self._by_date.get(channel_id, {})
+            logged = self._logged.get(channel_id, {})
+            if start is None or end is None:
+                dates = set(by_date) | set(logged)
+            else:
+                dates = set()
+                d = start.date()
+                while d <= end.date():
+                    dates.add(d)
+                    d += timedelta(days=1)
+
+            for d in dates:
+                for time_str in by_date.get(d, []):
+                    parsed = parse_sheet_time(time_str)
+                    if parsed is None:
+                        print(f"⚠️ Could not parse time: {d} {time_str}")
+                        continue
+                    blocked.add(datetime.combine(d, parsed.time()))
+                blocked.update(logged.get(d, ()))
+        return sorted(blocked)
+
+    def add(self, channel_id, slot: datetime):
+        """Record a slot this service just logged (naive IST datetime)"""
+        with self._lock:
+            per_date = self._logged.setdefault(channel_id, {})
+            per_date.setdefault(slot.date(), set()).add(slot.replace(tzinfo=None))
+            # Old days can no longer be scheduled into; keep the incremental part small
+            cutoff = date.today() - timedelta(days=2)
+            for d in [d for d in per_date if d < cutoff]:
+                del per_date[d]
+
+    def invalidate(self, channel_id=None):
+        with self._lock:
+            if channel_id is None:
+                self._loaded_at.clear()
+            else:
+                self._loaded_at.pop(channel_id, None)
@@ -0,0 +1,83 @@
+# calendar_slots.py
+# Booked calendar slots per date and channel, kept up to date by tailing the status journal.
+
+import calendar
+import os
+import threading
+from datetime import datetime, date
+from blocked_slots import parse_sheet_date
+
+
+def _parse_date(value):
+    value = str(value).strip()
+    if not value:
+        return None
+    try:
+        # Rows seeded from Excel carry full timestamps ("2025-01-31 00:00:00")
+        return datetime.fromisoformat(value).date()
+    except ValueError:
+        parsed = parse_sheet_date(value)
+        return parsed.date() if parsed else None
+
+
+def _parse_time(value):
+    try:
+        return datetime.strptime(str(value).strip(), "%H:%M:%S").time()
+    except ValueError:
+        return None
+
+
+class CalendarSlotIndex:
+    """
+    date -> [(channel, slot), ...] in log order. Reads only the journal bytes appended
+    since the last lookup, so rows written by other processes show up too.
+    """
+
+    def __init__(self, journal):
+        self._journal = journal
+        self._by_date = {}
+        self._offset = 0
+        self._lock = threading.Lock()
+
+    def _catch_up(self):
+        try:
+            size = os.path.getsize(self._journal.path)
+        except OSError:
+            return
+        if size == self._offset:
+            return
+        if size < self._offset:
+            # Journal was replaced; rebuild
+            self._by_date, self._offset = {}, 0
+        for next_offset, row in self._journal.read(self._offset):
+            self._add_row(row)
+            self._offset = next_offset
+
+    def _add_row(self, row):
+        slot_date = _parse_date(row.get("Date", ""))
+        slot_time = _parse_time(row.get("Time", ""))
+        if slot_date is None or slot_time is None:
+            return
+        channel = str(row.get("Channel", "") or "").lstrip("@").lower()
+        self._by_date.setdefault(slot_date, []).append((channel, {
+            "time": datetime.combine(slot_date, slot_time).isoformat(),
+            "status": "booked",
+            "post": row.get("Post Number")
+        }))
+
+    def day(self, day: date, channel: str = None):
+        with self._lock:
+            self._catch_up()
+            slots = self._by_date.get(day, [])
+            if channel:
+                channel = channel.lstrip("@").lower()
+                return [slot for slot_channel, slot in slots if slot_channel == channel]
+            return [slot for _, slot in slots]
+
+    def month(self, year: int, month: int, channel: str = None):
+        """Every day of the month -> its slots (empty list when nothing is booked)"""
+        days = calendar.monthrange(year, month)[1]
+        return {
+            date(year, month, d).isoformat(): self.day(date(year, month, d), channel)
+            for d in range(1, days + 1)
+        }
@@ -0,0 +1,218 @@
+# click_client.py
+# Async, pooled client for the link-click analytics API.
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+import httpx
+import pytz
+from dotenv import load_dotenv
+
+load_dotenv()
+
+API_URL = os.getenv("LINK_CLICKS_API")
+API_KEY = os.getenv("LINK_CLICKS_API_KEY")
+
+CLICKS_MAX_CONCURRENCY = int(os.getenv("CLICKS_MAX_CONCURRENCY", "10"))
+CLICKS_TIMEOUT_SECONDS = float(os.getenv("CLICKS_TIMEOUT_SECONDS", "10"))
+CLICKS_CACHE_MAX_ENTRIES = int(os.getenv("CLICKS_CACHE_MAX_ENTRIES", "20000"))
+CLICKS_TODAY_TTL_SECONDS = int(os.getenv("CLICKS_TODAY_TTL_SECONDS", "120"))
+
+ist = pytz.timezone("Asia/Kolkata")
+
+
+def normalize_link(link: str) -> str:
+    return link.replace("http://", "").replace("https://", "")
+
+
+class ClickCache:
+    """
+    LRU cache of raw click API items keyed by (normalized short URL, date).
+    Counts for days before today (IST) never change, so they do not expire;
+    today and future dates expire after CLICKS_TODAY_TTL_SECONDS.
+    """
+
+    def __init__(self, max_entries=CLICKS_CACHE_MAX_ENTRIES, today_ttl_seconds=CLICKS_TODAY_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.today_ttl_seconds = today_ttl_seconds
+        self._entries = OrderedDict()  # key -> (expires_at or None, items)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(link: str, date_str: str):
+        host, _, path = normalize_link(link).strip().rstrip("/").partition("/")
+        return (f"{host.lower()}/{path}", date_str)
+
+    def _expires_at(self, date_str: str):
+        today = datetime.now(ist).strftime("%Y-%m-%d")
+        if date_str < today:
+            return None
+        return time.monotonic() + self.today_ttl_seconds
+
+    def get(self, link: str, date_str: str):
+        """(True, items) on a hit, (False, None) on a miss"""
+        key = self._key(link, date_str)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, items = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, items
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, link: str, date_str: str, items):
+        if items is None:
+            return  # never cache failures
+        key = self._key(link, date_str)
+        with self._lock:
+            self._entries[key] = (self._expires_at(date_str), items)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "today_ttl_seconds": self.today_ttl_seconds,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+click_cache = ClickCache()
+
+
+def summarize_click_items(items_by_link):
+    """
+    Build the per-post click summary from per-link API responses.
+    items_by_link: list of (normalized_link, items) where items is the API list or None.
+    """
+    telegram_total = 0
+    whatsapp_total = 0
+    telegram_per_link = {}
+    whatsapp_per_link = {}
+    telegram_links = []
+    whatsapp_links = []
+
+    for normalized_link, items in items_by_link:
+        # API returns a list of clicks data for this link
+        for item in items or []:
+            acc = item.get("account")
+            clicks = int(item.get("clicks", 0))
+            shortened_url = item.get("shortened_url", normalized_link)
+
+            if acc == "telegram":
+                telegram_total += clicks
+                telegram_per_link[shortened_url] = clicks
+                if shortened_url not in telegram_links:
+                    telegram_links.append(shortened_url)
+
+            elif acc == "whatsapp":
+                whatsapp_total += clicks
+                whatsapp_per_link[shortened_url] = clicks
+                if shortened_url not in whatsapp_links:
+                    whatsapp_links.append(shortened_url)
+
+    return {
+        "telegram_clicks": telegram_total,
+        "whatsapp_clicks": whatsapp_total,
+        "telegram_clicks_per_link": telegram_per_link,
+        "whatsapp_clicks_per_link": whatsapp_per_link,
+        "telegram_links": telegram_links,
+        "whatsapp_links": whatsapp_links
+    }
+
+
+class ClickClient:
+    """Keep-alive connection pool with a concurrency cap and a deadline per call"""
+
+    def __init__(self, max_concurrency=CLICKS_MAX_CONCURRENCY, timeout_seconds=CLICKS_TIMEOUT_SECONDS):
+        self.max_concurrency = max_concurrency
+        self.timeout_seconds = timeout_seconds
+        self._client = None
+        self._semaphore = None
+
+    def _get_client(self):
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                headers={"X-API-KEY": API_KEY, "Content-Type": "application/json"},
+                timeout=httpx.Timeout(self.timeout_seconds),
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency
+                )
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    async def fetch(self, link: str, date_str: str):
+        """Raw API items for one link and date, or None on error/timeout"""
+        normalized_link = normalize_link(link)
+        hit, items = click_cache.get(normalized_link, date_str)
+        if hit:
+            return items
+
+        client = self._get_client()
+        payload = {"shortened_url": normalized_link, "date": date_str}
+        async with self._semaphore:
+            try:
+                response = await asyncio.wait_for(
+                    client.post(API_URL, json=payload),
+                    timeout=self.timeout_seconds
+                )
+                response.raise_for_status()
+                items = response.json()
+                click_cache.put(normalized_link, date_str, items)
+                return items
+            except Exception as e:
+                print(f"⚠️ Error fetching clicks for {normalized_link}: {e!r}")
+                return None
+
+    async def get_click_data_for_links(self, links, date_str):
+        """Async get_click_data_for_links: all unique links fetched concurrently"""
+        return (await self.get_click_data_for_posts([(links, date_str)]))[0]
+
+    async def get_click_data_for_posts(self, posts):
+        """
+        Click summaries for many posts at once.
+        posts: list of (links, date_str); every distinct (link, date) is fetched once, all in parallel.
+        """
+        keys = list(dict.fromkeys(
+            (normalize_link(link), date_str)
+            for links, date_str in posts
+            for link in set(links or [])
+        ))
+        results = await asyncio.gather(*(self.fetch(link, date_str) for link, date_str in keys))
+        items = dict(zip(keys, results))
+
+        summaries = []
+        for links, date_str in posts:
+            unique_links = list(dict.fromkeys(normalize_link(link) for link in links or []))
+            summaries.append(summarize_click_items(
+                [(link, items.get((link, date_str))) for link in unique_links]
+            ))
+        return summaries
+
+    async def close(self):
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+
+click_client = ClickClient()
@@ -1,11 +1,51 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Response
 from fastapi.responses import FileResponse
+from collections import OrderedDict
+from typing import Optional
 import os
+import threading
 import pandas as pd
+from blocked_slots import parse_sheet_date
 
 router = APIRouter()
 LOGS_DIR = "logs"
 
+# Parsed log files kept in memory, keyed by path and invalidated by mtime/size
+LOG_FRAME_CACHE_MAX_FILES = int(os.getenv("LOG_FRAME_CACHE_MAX_FILES", "8"))
+LOG_PREVIEW_MAX_LIMIT = 1000
+
+_frame_cache = OrderedDict()  # path -> (mtime, size, frame, dates)
+_frame_cache_lock = threading.Lock()
+
+
+def _normalize_date(value: str) -> str:
+    """YYYY-MM-DD for any DATE_FORMATS value (optionally followed by a time), else "" """
+    parsed = parse_sheet_date(value) or parse_sheet_date(value.split(" ")[0])
+    return parsed.strftime("%Y-%m-%d") if parsed else ""
+
+def load_log_frame(path: str):
+    """(frame with NaN filled as "", normalized YYYY-MM-DD dates or None) for an Excel log"""
+    stat = os.stat(path)
+    with _frame_cache_lock:
+        cached = _frame_cache.get(path)
+        if cached and cached[0] == stat.st_mtime and cached[1] == stat.st_size:
+            _frame_cache.move_to_end(path)
+            return cached[2], cached[3]
+
+    df = pd.read_excel(path).fillna("")
+    dates = None
+    if "Date" in df.columns:
+        # Row by row with the sheets' fixed format order: pandas would infer one format and drop the rest
+        values = df["Date"].astype(str).str.strip()
+        dates = values.map({value: _normalize_date(value) for value in values.unique()})
+
+    with _frame_cache_lock:
+        _frame_cache[path] = (stat.st_mtime, stat.st_size, df, dates)
+        _frame_cache.move_to_end(path)
+        while len(_frame_cache) > LOG_FRAME_CACHE_MAX_FILES:
+            _frame_cache.popitem(last=False)
+    return df, dates
+
 @router.get("/logs")
 def list_log_files():
     files = []
@@ -20,13 +60,62 @@ def list_log_files():
     return sorted(files, key=lambda f: f["timestamp"], reverse=True)
 
 @router.get("/logs/{filename}")
-def preview_excel_file(filename: str):
+def preview_excel_file(
+    filename: str,
+    response: Response,
+    offset: Optional[int] = Query(None, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=LOG_PREVIEW_MAX_LIMIT),
+    columns: Optional[str] = Query(None, description="Comma-separated column names"),
+    date: Optional[str] = Query(None, description="YYYY-MM-DD"),
+    channel: Optional[str] = Query(None),
+    status: Optional[str] = Query(None, description="Case-insensitive substring of Status")
+):
     path = os.path.join(LOGS_DIR, filename)
     if not os.path.exists(path):
         raise HTTPException(status_code=404, detail="File not found")
-    
-    df = pd.read_excel(path)
-    return df.fillna("").to_dict(orient="records")
+
+    df, dates = load_log_frame(path)
+    total = len(df)
+    response.headers["X-Total-Count"] = str(total)
+
+    # No paging/filter parameters: the full list, as before
+    if all(p is None for p in (offset, limit, columns, date, channel, status)):
+        return df.to_dict(orient="records")
+
+    mask = pd.Series(True, index=df.index)
+    if date:
+        if dates is None:
+            raise HTTPException(status_code=400, detail="This log has no Date column")
+        mask &= dates == date
+    if channel:
+        if "Channel" not in df.columns:
+            raise HTTPException(status_code=400, detail="This log has no Channel column")
+        mask &= df["Channel"].astype(str).str.lstrip("@").str.lower() == channel.lstrip("@").lower()
+    if status:
+        if "Status" not in df.columns:
+            raise HTTPException(status_code=400, detail="This log has no Status column")
+        mask &= df["Status"].astype(str).str.contains(status, case=False, regex=False)
+
+    selected = list(df.columns)
+    if columns:
+        selected = [c.strip() for c in columns.split(",") if c.strip()]
+        unknown = [c for c in selected if c not in df.columns]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown columns: {', '.join(unknown)}")
+
+    filtered = df[mask]
+    start = offset or 0
+    end = start + (limit or LOG_PREVIEW_MAX_LIMIT)
+    page = filtered.iloc[start:end][selected]
+
+    return {
+        "total": total,
+        "filtered": len(filtered),
+        "offset": start,
+        "limit": end - start,
+        "columns": selected,
+        "rows": page.to_dict(orient="records")
+    }
 
 @router.get("/logs/download/{filename}")
 def download_excel_file(filename: str):
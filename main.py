@@ -1,13 +1,15 @@
 # main.py
 from fastapi import FastAPI, UploadFile, File, BackgroundTasks, Form, Request, Query, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import os, re, json
-from typing import List
+import asyncio
+from typing import List, Optional
 from datetime import date, datetime, timezone,timedelta
 from logs_api import router as logs_router
-from telegram_utils import CHANNELS, extract_all_posts_from_texts, send_telegram_message,get_blocked_times_from_sheet,initialize_google_sheets,sheets_available,api_id, api_hash, session_string,save_posts_to_channel_date_sheets,get_click_data_for_links
+from telegram_utils import CHANNELS, extract_all_posts_from_texts, send_telegram_message,get_blocked_times_from_sheet,initialize_google_sheets,sheets_available,api_id, api_hash, session_string,save_posts_to_channel_date_sheets,get_click_data_for_links,MediaUploadCache,sheets_queue,replay_status_journal,status_journal
 import pandas as pd
 import pytz
 from pydantic import BaseModel
@@ -15,18 +17,58 @@ import openpyxl
 from telethon import TelegramClient
 from telethon.tl.types import MessageMediaPhoto
 from telethon.sessions import StringSession
-from telethon.tl.functions.messages import GetScheduledHistoryRequest
 from telethon.tl.functions.channels import GetFullChannelRequest
 from telethon.tl.types import InputPeerChannel
 from dateutil import parser
 from clicksFind import get_clicks
+from telegram_client import client_manager
+from peer_cache import peer_cache
+from click_client import click_client, click_cache
+from telegram_history import count_live_posts, COUNT_MODES, scheduled_history
+from message_index import message_index, row_from_message
+from calendar_slots import CalendarSlotIndex
+from workspaces import WorkspaceManager, WorkspaceStaticFiles
+from slot_allocator import SlotGrid, allocate, round_to_nearest_5
+from slot_reservations import slot_reservations
+from plan_store import PlanStore
+from batch_jobs import BatchJobManager
+from telegram_limiter import telegram_limiter
 ist = pytz.timezone("Asia/Kolkata")
 
 
 UPLOAD_DIR = "uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
-
-app = FastAPI()  # <== All API routes will be prefixed with /api
+# Each scheduling request uploads into its own workspace; old ones are reaped in the background
+upload_workspaces = WorkspaceManager(UPLOAD_DIR)
+# Ingested batches waiting for /api/auto-schedule/commit; expired ones give back their uploads
+scheduling_plans = PlanStore(on_expire=lambda plan: upload_workspaces.release(plan["workspace"]))
+batch_jobs = BatchJobManager()
+
+# Max number of channels scheduled in parallel by /api/auto-schedule
+AUTO_SCHEDULE_CONCURRENCY = int(os.getenv("AUTO_SCHEDULE_CONCURRENCY", "5"))
+# Posts buffered (with their click lookups in flight) ahead of a slow /api/read-posts/stream reader
+READ_POSTS_STREAM_BUFFER = int(os.getenv("READ_POSTS_STREAM_BUFFER", "50"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One shared Telegram connection for the whole app lifetime
+    try:
+        await client_manager.start()
+    except Exception as e:
+        print(f"⚠️ Telegram client could not connect at startup (will retry on demand): {e}")
+    upload_workspaces.start()
+    scheduling_plans.start()
+    batch_jobs.start()
+    yield
+    await batch_jobs.stop()
+    await scheduling_plans.stop()
+    await upload_workspaces.stop()
+    await client_manager.stop()
+    await click_client.close()
+    # Flush queued Google Sheets status rows before exiting
+    await asyncio.to_thread(sheets_queue.stop)
+
+app = FastAPI(lifespan=lifespan)  # <== All API routes will be prefixed with /api
 
 app.add_middleware(
     CORSMiddleware,
@@ -40,7 +82,7 @@ app.add_middleware(
 )
 
 # Static Mounts
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+app.mount("/uploads", WorkspaceStaticFiles(upload_workspaces), name="uploads")
 app.mount("/logs", StaticFiles(directory="logs"), name="logs")
 app.include_router(logs_router, prefix="/api")
 
@@ -54,6 +96,9 @@ async def connect_or_check(request: Request):
         # Attempt to reconnect
         success = initialize_google_sheets()
         sheets_available = success
+        if success:
+            # Rows logged locally while Sheets was down
+            await asyncio.to_thread(replay_status_journal)
         return {
             "connected": success,
             "message": "✅ Connected to Google Sheets" if success else "❌ Failed to connect Google Sheets"
@@ -65,28 +110,13 @@ async def connect_or_check(request: Request):
             "message": "✅ Google Sheets connected" if sheets_available else "❌ Google Sheets not connected"
         }
 
+@app.get("/api/telegram/health")
+async def telegram_health():
+    return await client_manager.check_health()
+
 def to_utc_naive(dt: datetime) -> datetime:
     return dt.astimezone(timezone.utc).replace(tzinfo=None)
 
-def round_to_nearest_5(dt: datetime) -> datetime:
-    """
-    Rounds time to the nearest 5-minute mark.
-    Examples:
-        10:27 → 10:25
-        10:28 → 10:30
-    """
-    minute = dt.minute
-    remainder = minute % 5
-    if remainder < 3:
-        minute -= remainder
-    else:
-        minute += (5 - remainder)
-    if minute == 60:
-        dt = dt.replace(minute=0) + timedelta(hours=1)
-    else:
-        dt = dt.replace(minute=minute)
-    return dt.replace(second=0, microsecond=0)
-
 def parse_custom_time(time_str: str, base_date: datetime) -> datetime:
     """
     Parse custom time from text file and combine with base date.
@@ -138,6 +168,438 @@ def parse_custom_time(time_str: str, base_date: datetime) -> datetime:
 
 
 
+async def schedule_channel_lane(channel_id, all_post_nums, post_times, image_map, text_posts, blocked_times_ist, semaphore, reservation_token=None, on_post=None, media_cache=None):
+    """
+    Schedule every post for one channel, strictly in post order.
+    Lanes for different channels run concurrently, capped by `semaphore`.
+    Each slot reserved under `reservation_token` is confirmed when its send succeeds
+    and released when it fails. on_post(entry) sees every post as soon as it is handled.
+    """
+    channel_username = CHANNELS[channel_id]['username']
+    async with semaphore:
+        print(f"Processing channel: @{channel_username}")
+        
+        channel_scheduled = 0
+        channel_failed = 0
+        channel_skipped = 0
+        channel_posts = []
+
+        def record(entry):
+            channel_posts.append(entry)
+            if on_post is not None:
+                on_post(entry)
+        
+        for post_num in all_post_nums:
+            scheduled_time = post_times.get(post_num)
+            image_path = image_map.get(post_num)
+            post_data = text_posts.get(post_num, {})
+            post_text = post_data.get('text') if isinstance(post_data, dict) else post_data
+            category = post_data.get('category') if isinstance(post_data, dict) else None
+            custom_time = post_data.get('custom_time') if isinstance(post_data, dict) else None
+
+            if not scheduled_time:
+                record({
+                    "post": post_num,
+                    "image": os.path.basename(image_path) if image_path else None,
+                    "text": post_text,
+                    "category": category,
+                    "custom_time": custom_time,
+                    "time": "N/A",
+                    "date": None,
+                    "status": "skipped",
+                    "error": "No available slot within selected window",
+                    "channel": f"@{channel_username}"
+                })
+                channel_skipped += 1
+                continue
+
+            # Double-check: don't schedule on blocked times
+            if scheduled_time in blocked_times_ist:
+                record({
+                    "post": post_num,
+                    "image": os.path.basename(image_path) if image_path else None,
+                    "text": post_text,
+                    "category": category,
+                    "custom_time": custom_time,
+                    "time": scheduled_time.strftime("%H:%M"),
+                    "date": scheduled_time.strftime("%Y-%m-%d"),
+                    "status": "skipped",
+                    "error": "Time slot is blocked in Google Sheet",
+                    "channel": f"@{channel_username}"
+                })
+                channel_skipped += 1
+                continue
+
+            # Schedule the post
+            if not scheduled_time:
+                continue
+            schedule_time = to_utc_naive(scheduled_time)
+            try:
+                sent = await send_telegram_message(
+                    image_path=image_map.get(post_num),
+                    post_text=post_text,
+                    post_number=post_num,
+                    category=category,
+                    schedule_time=schedule_time,
+                    channel_username=channel_username,
+                    channel_id=channel_id,
+                    media_cache=media_cache
+                )
+                error = None if sent else "Telegram did not accept the post (see post logs)"
+            except Exception as e:
+                sent = False
+                error = str(e)
+
+            if sent:
+                channel_scheduled += 1
+                status = "scheduled"
+                print(f"Scheduled post {post_num} to @{channel_username} at {scheduled_time}")
+            else:
+                status = "failed"
+                channel_failed += 1
+                print(f"Failed to schedule post {post_num} to @{channel_username}: {error}")
+
+            if reservation_token:
+                settle = slot_reservations.confirm if sent else slot_reservations.release
+                await asyncio.to_thread(settle, channel_id, scheduled_time, reservation_token)
+
+            record({
+                "post": post_num,
+                "image": os.path.basename(image_path) if image_path else None,
+                "text": post_text,
+                "category": category,
+                "time": scheduled_time.strftime("%H:%M") if scheduled_time else "N/A",
+                # Windows can span several days
+                "date": scheduled_time.strftime("%Y-%m-%d") if scheduled_time else None,
+                "status": status,
+                "error": error,
+                "channel": f"@{channel_username}"
+            })
+    
+        print(f"Channel @{channel_username}: {channel_scheduled} scheduled, {channel_failed} failed, {channel_skipped} skipped")
+
+    return {
+        "posts": channel_posts,
+        "scheduled": channel_scheduled,
+        "failed": channel_failed,
+        "skipped": channel_skipped
+    }
+
+class PlanRejected(Exception):
+    """Invalid scheduling input found while planning (reported as 400)"""
+
+
+class SlotsTaken(Exception):
+    """Slots of a stored plan were blocked or reserved since it was previewed (reported as 409)"""
+
+    def __init__(self, posts):
+        super().__init__(f"Planned slots are no longer free for posts {[entry['post'] for entry in posts]}")
+        self.posts = posts
+
+
+async def ingest_batch_uploads(workspace, text_files, image_files):
+    """Save one batch of uploads into its workspace; returns (text_posts, image_map)"""
+    image_map = {}
+    text_posts = {}
+
+    # Save and process text files (parsed while they are written to disk)
+    for file in text_files:
+        _, file_posts = await workspace.save_text(file)
+        text_posts.update(file_posts)
+
+    print(f"📝 Extracted {len(text_posts)} posts from text files")
+
+    # Save and process image files
+    for file in image_files:
+        fname = file.filename.lower()
+        filepath = (await workspace.save(file))["path"]
+
+        match = re.search(r'(?:\*{0,2})\s*post\s*[-_\s]*(\d+)', fname, re.IGNORECASE)
+        if match:
+            post_num = int(match.group(1))
+            image_map[post_num] = filepath
+            print(f"🎯 Mapped image {file.filename} to post {post_num}")
+
+    return text_posts, image_map
+
+
+def load_blocked_times_ist(selected_channels, start_dt, end_dt):
+    """Blocked times from the Sheet for the window, as IST datetimes on the 5-minute grid"""
+    # Get blocked times from Google Sheet (these are naive datetime objects)
+    # Pad by one grid step so times that round into the window are included
+    sheet_blocked_times_naive = get_blocked_times_from_sheet(
+        selected_channels,
+        (start_dt - timedelta(minutes=5)).replace(tzinfo=None),
+        (end_dt + timedelta(minutes=5)).replace(tzinfo=None)
+    )
+
+    # Convert blocked times to IST timezone-aware datetimes for comparison
+    blocked_times_ist = set()
+    for naive_dt in sheet_blocked_times_naive:
+        # Assume sheet times are in IST and make them timezone-aware
+        if naive_dt.tzinfo is None:
+            ist_dt = ist.localize(naive_dt)
+        else:
+            ist_dt = naive_dt.astimezone(ist)
+
+        # Round to nearest 5 minutes to match our grid
+        rounded_dt = round_to_nearest_5(ist_dt)
+        blocked_times_ist.add(rounded_dt)
+
+    print(f"📅 Blocked times from GSheet (IST): {sorted(blocked_times_ist)}")
+    return blocked_times_ist
+
+
+def frontend_time_slots(grid, blocked_slots, reserved_slots, assigned):
+    time_slots = []
+    for slot in range(grid.count):
+        # Slots held by concurrent requests show as blocked
+        if slot in blocked_slots or slot in reserved_slots:
+            status = "blocked"
+        else:
+            status = "assigned" if slot in assigned else "free"
+        time_slots.append({
+            "time": grid.time_of(slot).strftime("%Y-%m-%d %H:%M"),
+            "status": status
+        })
+    return time_slots
+
+
+async def plan_batch(all_post_nums, selected_channels, start_dt, end_dt, times, interval_minutes, claim=True):
+    """
+    Pick a slot for every post: blocked times from the Sheet, custom times from the form,
+    then fixed interval or even spread. With claim=True the chosen slots are reserved for
+    the selected channels (see slot_reservations); otherwise this is a preview only.
+    """
+    blocked_times_ist = load_blocked_times_ist(selected_channels, start_dt, end_dt)
+
+    # 5-min grid inside the window, as integer slot offsets from start_dt
+    grid = SlotGrid(start_dt, end_dt)
+    blocked_slots = {grid.slot_of(dt) for dt in blocked_times_ist}
+    available_count = sum(1 for slot in range(grid.count) if slot not in blocked_slots)
+    print(f"📊 Available slots: {available_count} out of {grid.count} total slots")
+
+    # Scheduling logic
+    pinned = {}
+    print(f"📝 Raw times from form: {times}")
+
+    # Handle custom times from frontend: "post|HH:MM" (first day of the window) or "post|YYYY-MM-DDTHH:MM"
+    for entry in times or []:
+        if '|' in entry:
+            post_str, time_str = entry.split('|', 1)
+            try:
+                post_num = int(post_str.strip())
+                time_str = time_str.strip()
+                if len(time_str) >= 10 and time_str[4] == '-':
+                    dt_time = datetime.fromisoformat(time_str.replace("Z", ""))
+                else:
+                    dt_time = parse_custom_time(time_str, start_dt)
+                if not dt_time:
+                    print(f"⚠️ Could not parse custom time: {time_str}")
+                    continue
+                dt_time = round_to_nearest_5(ist.localize(dt_time)) if dt_time.tzinfo is None else dt_time
+            except Exception as e:
+                print(f"Invalid time format: {entry} - {e}")
+                continue
+
+            # Ensure custom time is on one of the selected dates
+            if not start_dt.date() <= dt_time.date() <= end_dt.date():
+                if start_dt.date() == end_dt.date():
+                    raise PlanRejected(f"Custom time {time_str} must be on the selected date {start_dt.date()}")
+                raise PlanRejected(f"Custom time {time_str} must be between {start_dt.date()} and {end_dt.date()}")
+
+            pinned[post_num] = grid.slot_of(dt_time)
+            if pinned[post_num] in blocked_slots:
+                print(f"⚠️ Custom time {dt_time} is blocked (from GSheet). Skipping post {post_num}.")
+            else:
+                print(f"✅ Custom time for post {post_num}: {dt_time}")
+
+    # Pinned posts first, then the rest by fixed interval or spread evenly over the free slots.
+    # Runs inside the reservation lock: slots held by concurrent requests count as blocked,
+    # and the slots chosen here are claimed for every selected channel before anyone else plans.
+    lane_channels = [channel_id for channel_id in selected_channels if channel_id in CHANNELS]
+
+    def plan_slots(reserved):
+        reserved_slots = {grid.slot_of(dt) for dt in reserved} - blocked_slots
+        slot_by_post, assigned = allocate(all_post_nums, grid, blocked_slots | reserved_slots, pinned, interval_minutes)
+        to_claim = [grid.time_of(slot) for slot in assigned] if claim else []
+        return (slot_by_post, assigned, reserved_slots), to_claim
+
+    (slot_by_post, assigned, reserved_slots), _, reservation_token = await asyncio.to_thread(
+        slot_reservations.plan, lane_channels, grid.start, grid.end, plan_slots
+    )
+    if reserved_slots:
+        print(f"🔒 {len(reserved_slots)} slots reserved by other requests")
+
+    post_times = {
+        post_num: grid.time_of(slot) if slot is not None else None
+        for post_num, slot in slot_by_post.items()
+    }
+    for post_num in all_post_nums:
+        if post_num in pinned:
+            continue
+        if post_times.get(post_num) is None:
+            print(f"⚠️ No available slot for post {post_num}")
+        else:
+            print(f"✅ {'Interval scheduling' if interval_minutes > 0 else 'Auto distribute'}: Post {post_num} at {post_times[post_num]}")
+
+    return {
+        "post_times": post_times,
+        "blocked_times_ist": blocked_times_ist,
+        "reserved_slots": len(reserved_slots),
+        "time_slots": frontend_time_slots(grid, blocked_slots, reserved_slots, assigned),
+        "reservation_token": reservation_token if claim else None
+    }
+
+
+async def claim_planned_batch(all_post_nums, selected_channels, start_dt, end_dt, post_times):
+    """
+    Claim exactly the slots a stored plan previewed, for the selected channels. Raises
+    SlotsTaken (claiming nothing) if any of them was blocked in the Sheet or reserved
+    by another request since. Returns a schedule shaped like plan_batch's.
+    """
+    blocked_times_ist = load_blocked_times_ist(selected_channels, start_dt, end_dt)
+    grid = SlotGrid(start_dt, end_dt)
+    blocked_slots = {grid.slot_of(dt) for dt in blocked_times_ist}
+    slot_by_post = {
+        post_num: grid.slot_of(post_times[post_num]) if post_times.get(post_num) else None
+        for post_num in all_post_nums
+    }
+    assigned = {slot for slot in slot_by_post.values() if slot is not None}
+    lane_channels = [channel_id for channel_id in selected_channels if channel_id in CHANNELS]
+
+    def claim_slots(reserved):
+        reserved_slots = {grid.slot_of(dt) for dt in reserved} - blocked_slots
+        taken = [
+            {
+                "post": post_num,
+                "time": grid.time_of(slot).strftime("%Y-%m-%d %H:%M"),
+                "reason": "blocked in Google Sheet" if slot in blocked_slots else "reserved by another request"
+            }
+            for post_num, slot in slot_by_post.items()
+            if slot is not None and (slot in blocked_slots or slot in reserved_slots)
+        ]
+        if taken:
+            return (reserved_slots, taken), []
+        return (reserved_slots, taken), [grid.time_of(slot) for slot in assigned]
+
+    (reserved_slots, taken), _, reservation_token = await asyncio.to_thread(
+        slot_reservations.plan, lane_channels, grid.start, grid.end, claim_slots
+    )
+    if taken:
+        raise SlotsTaken(taken)
+
+    return {
+        "post_times": {
+            post_num: grid.time_of(slot) if slot is not None else None
+            for post_num, slot in slot_by_post.items()
+        },
+        "blocked_times_ist": blocked_times_ist,
+        "reserved_slots": len(reserved_slots),
+        "time_slots": frontend_time_slots(grid, blocked_slots, reserved_slots, assigned),
+        "reservation_token": reservation_token
+    }
+
+
+async def execute_batch(selected_channels, all_post_nums, image_map, text_posts, schedule, on_post=None):
+    """Send a planned batch: one ordered lane per channel, lanes run concurrently"""
+    all_results = []
+    total_scheduled = 0
+    total_failed = 0
+    total_skipped = 0
+
+    semaphore = asyncio.Semaphore(max(1, AUTO_SCHEDULE_CONCURRENCY))
+    # Uploaded photo handles are shared by this batch's lanes only
+    media_cache = MediaUploadCache()
+    lanes = []
+    for channel_id in selected_channels:
+        if channel_id not in CHANNELS:
+            print(f"Unknown channel: {channel_id}")
+            continue
+        lanes.append(schedule_channel_lane(
+            channel_id, all_post_nums, schedule["post_times"], image_map, text_posts, schedule["blocked_times_ist"], semaphore,
+            reservation_token=schedule["reservation_token"], on_post=on_post, media_cache=media_cache
+        ))
+
+    # gather keeps results in selected_channels order
+    for lane_result in await asyncio.gather(*lanes):
+        all_results.extend(lane_result["posts"])
+        total_scheduled += lane_result["scheduled"]
+        total_failed += lane_result["failed"]
+        total_skipped += lane_result["skipped"]
+
+    return {
+        "status": f"Scheduled {total_scheduled} posts across {len(selected_channels)} channels, {total_failed} failed, {total_skipped} skipped",
+        "posts": all_results,
+        "scheduled": total_scheduled,
+        "failed": total_failed,
+        "skipped": total_skipped,
+        "total": len(all_post_nums) * len(selected_channels),
+        "blocked_slots": len(schedule["blocked_times_ist"]),
+        "reserved_slots": schedule["reserved_slots"],
+        "time_slots": schedule["time_slots"],
+        "channels_processed": len(selected_channels)
+    }
+
+
+def start_batch_job(workspace, selected_channels, all_post_nums, image_map, text_posts, schedule):
+    """Run execute_batch as a background job; the job owns the workspace and reservations from here"""
+    async def run(job):
+        try:
+            return await execute_batch(selected_channels, all_post_nums, image_map, text_posts, schedule, on_post=job.record)
+        finally:
+            upload_workspaces.release(workspace)
+            if schedule["reservation_token"] is not None:
+                await asyncio.to_thread(slot_reservations.release_unconfirmed, schedule["reservation_token"])
+
+    job = batch_jobs.submit(len(all_post_nums) * len(selected_channels), run)
+    print(f"🚀 Started scheduling job {job.id} ({job.total} posts)")
+    return JSONResponse(status_code=202, content={
+        "job_id": job.id,
+        "status": job.status,
+        "total": job.total,
+        "status_url": f"/api/jobs/{job.id}",
+        "events_url": f"/api/jobs/{job.id}/events"
+    })
+
+
+def parse_batch_window(start_time: str, end_time: str):
+    start_dt = round_to_nearest_5(ist.localize(datetime.fromisoformat(start_time.replace("Z", ""))))
+    end_dt = round_to_nearest_5(ist.localize(parser.isoparse(end_time)))
+    return start_dt, end_dt
+
+
+def store_batch_plan(workspace, selected_channels, start_dt, end_dt, times, interval_minutes, text_posts, image_map, post_times):
+    """Keep an ingested batch and its previewed slots for /api/auto-schedule/commit; the plan now owns the workspace"""
+    return scheduling_plans.put({
+        "workspace": workspace,
+        "channels": selected_channels,
+        "start_dt": start_dt,
+        "end_dt": end_dt,
+        "times": list(times),
+        "interval_minutes": interval_minutes,
+        "text_posts": text_posts,
+        "image_map": image_map,
+        "post_times": post_times
+    })
+
+
+def preview_posts(all_post_nums, image_map, text_posts, post_times):
+    preview = []
+    for post_num in all_post_nums:
+        post_data = text_posts.get(post_num, {})
+        scheduled_time = post_times.get(post_num)
+        preview.append({
+            "post": post_num,
+            "image": os.path.basename(image_map[post_num]) if post_num in image_map else None,
+            "text": post_data.get('text') if isinstance(post_data, dict) else post_data,
+            "category": post_data.get('category') if isinstance(post_data, dict) else None,
+            "custom_time": post_data.get('custom_time') if isinstance(post_data, dict) else None,
+            "time": scheduled_time.strftime("%Y-%m-%d %H:%M") if scheduled_time else "N/A"
+        })
+    return preview
+
+
 # Add this parameter to the function signature
 @app.post("/api/auto-schedule")
 async def auto_schedule(
@@ -150,8 +612,11 @@ async def auto_schedule(
     channels: str = Form(...),
     send_image_only: bool = Form(default=False),
     interval_minutes: int = Form(default=0),
-    scheduling_mode: str = Form(default="auto")
+    scheduling_mode: str = Form(default="auto"),
+    background: bool = Form(default=False)
 ):
+    workspace = None
+    schedule = None
     try:
 
         # Parse selected channels
@@ -160,330 +625,220 @@ async def auto_schedule(
             return JSONResponse(status_code=400, content={"error": "Please select at least one channel"})
         
         print(f"Selected channels: {selected_channels}")
-        # Clear upload directory
-        for f in os.listdir(UPLOAD_DIR):
-            os.remove(os.path.join(UPLOAD_DIR, f))
-
-        image_map = {}
-        text_contents = []
-        text_posts = {}
-
-        # Save and process text files
-        for file in text_files:
-            filepath = os.path.join(UPLOAD_DIR, file.filename)
-            with open(filepath, "wb") as f:
-                f.write(await file.read())
-
-            with open(filepath, 'r', encoding='utf-8') as f:
-                text = f.read()
-                text_contents.append(text)
-        
-        text_posts = extract_all_posts_from_texts(text_contents)
-
-        print(f"📝 Extracted {len(text_posts)} posts from text files")
-
-        # Save and process image files
-        for file in image_files:
-            fname = file.filename.lower()
-            filepath = os.path.join(UPLOAD_DIR, file.filename)
-            with open(filepath, "wb") as f:
-                f.write(await file.read())
-
-            match = re.search(r'(?:\*{0,2})\s*post\s*[-_\s]*(\d+)', fname, re.IGNORECASE)
-            if match:
-                post_num = int(match.group(1))
-                image_map[post_num] = filepath
-                print(f"🎯 Mapped image {file.filename} to post {post_num}")
+        workspace = upload_workspaces.create()
+        text_posts, image_map = await ingest_batch_uploads(workspace, text_files, image_files)
 
         # Combine all post numbers
         all_post_nums = sorted(set(text_posts.keys()) | set(image_map.keys()))
         image_only_posts = [num for num in image_map if num not in text_posts]
 
+        if not all_post_nums:
+            return JSONResponse(status_code=400, content={"error": "No valid posts detected."})
+
+        # Parse start and end date-times
+        start_dt, end_dt = parse_batch_window(start_time, end_time)
+        form_data = await request.form()
+        times = form_data.getlist('times[]')
 
         if image_only_posts and not send_image_only:
+            # Keep the uploads: confirming through /api/auto-schedule/commit needs no second upload
+            schedule = await plan_batch(all_post_nums, selected_channels, start_dt, end_dt, times, interval_minutes, claim=False)
+            plan_id = store_batch_plan(workspace, selected_channels, start_dt, end_dt, times, interval_minutes, text_posts, image_map, schedule["post_times"])
+            workspace = None
             return JSONResponse({
                 "status": "confirm_image_only",
-                "image_only_posts": image_only_posts
+                "image_only_posts": image_only_posts,
+                "plan_id": plan_id,
+                "expires_in": scheduling_plans.ttl_seconds,
+                "time_slots": schedule["time_slots"]
             })
 
+        schedule = await plan_batch(all_post_nums, selected_channels, start_dt, end_dt, times, interval_minutes)
+        if background:
+            response = start_batch_job(workspace, selected_channels, all_post_nums, image_map, text_posts, schedule)
+            workspace = schedule = None
+            return response
+        return JSONResponse(await execute_batch(selected_channels, all_post_nums, image_map, text_posts, schedule))
+
+    except PlanRejected as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except Exception as e:
+        print(f"Error in /api/auto-schedule: {e}")
+        return JSONResponse(status_code=500, content={"error": "Internal server error"})
+    finally:
+        if workspace is not None:
+            upload_workspaces.release(workspace)
+        if schedule is not None and schedule["reservation_token"] is not None:
+            # Anything planned but never sent (early return, error) goes back to the pool
+            await asyncio.to_thread(slot_reservations.release_unconfirmed, schedule["reservation_token"])
+
+
+@app.post("/api/auto-schedule/plan")
+async def plan_auto_schedule(
+    request: Request,
+    text_files: List[UploadFile] = File([]),
+    image_files: List[UploadFile] = File([]),
+    start_time: str = Form(...),
+    end_time: str = Form(...),
+    channels: str = Form(...),
+    interval_minutes: int = Form(default=0)
+):
+    """Upload and parse a batch once; returns a plan id and the preview to confirm or edit"""
+    workspace = None
+    try:
+        selected_channels = json.loads(channels) if channels else []
+        if not selected_channels:
+            return JSONResponse(status_code=400, content={"error": "Please select at least one channel"})
+
+        workspace = upload_workspaces.create()
+        text_posts, image_map = await ingest_batch_uploads(workspace, text_files, image_files)
+        all_post_nums = sorted(set(text_posts.keys()) | set(image_map.keys()))
         if not all_post_nums:
             return JSONResponse(status_code=400, content={"error": "No valid posts detected."})
 
-        # Parse start and end date-times
-        start_dt = round_to_nearest_5(ist.localize(datetime.fromisoformat(start_time.replace("Z", ""))))
-        end_dt = round_to_nearest_5(ist.localize(parser.isoparse(end_time)))
-
+        start_dt, end_dt = parse_batch_window(start_time, end_time)
+        form_data = await request.form()
+        times = form_data.getlist('times[]')
 
-        # Get blocked times from Google Sheet (these are naive datetime objects)
-        sheet_blocked_times_naive = get_blocked_times_from_sheet(selected_channels)
-        
-        # Convert blocked times to IST timezone-aware datetimes for comparison
-        blocked_times_ist = set()
-        for naive_dt in sheet_blocked_times_naive:
-            # Assume sheet times are in IST and make them timezone-aware
-            if naive_dt.tzinfo is None:
-                ist_dt = ist.localize(naive_dt)
-            else:
-                ist_dt = naive_dt.astimezone(ist)
+        schedule = await plan_batch(all_post_nums, selected_channels, start_dt, end_dt, times, interval_minutes, claim=False)
+        plan_id = store_batch_plan(workspace, selected_channels, start_dt, end_dt, times, interval_minutes, text_posts, image_map, schedule["post_times"])
+        workspace = None
 
-            # Round to nearest 5 minutes to match our grid
-            rounded_dt = round_to_nearest_5(ist_dt)
-            blocked_times_ist.add(rounded_dt)
-        
-        print(f"📅 Blocked times from GSheet (IST): {sorted(blocked_times_ist)}")
+        return JSONResponse({
+            "plan_id": plan_id,
+            "expires_in": scheduling_plans.ttl_seconds,
+            "posts": preview_posts(all_post_nums, image_map, text_posts, schedule["post_times"]),
+            "image_only_posts": [num for num in image_map if num not in text_posts],
+            "total": len(all_post_nums) * len(selected_channels),
+            "blocked_slots": len(schedule["blocked_times_ist"]),
+            "reserved_slots": schedule["reserved_slots"],
+            "time_slots": schedule["time_slots"]
+        })
 
-        # Build 5-min grid inside the window
-        ui_grid = []
-        g = start_dt
-        while g <= end_dt:
-            ui_grid.append(round_to_nearest_5(g))
-            g += timedelta(minutes=5)
+    except PlanRejected as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except Exception as e:
+        print(f"Error in /api/auto-schedule/plan: {e}")
+        return JSONResponse(status_code=500, content={"error": "Internal server error"})
+    finally:
+        if workspace is not None:
+            upload_workspaces.release(workspace)
 
-        # Filter out blocked times from available slots
-        available_slots = [slot for slot in ui_grid if slot not in blocked_times_ist]
-        print(f"📊 Available slots: {len(available_slots)} out of {len(ui_grid)} total slots")
 
-        # Scheduling logic
-        post_times = {}
-        assigned_slots = set()
+class CommitPlanRequest(BaseModel):
+    plan_id: str
+    send_image_only: bool = True
+    # Optional edits; anything left out keeps the planned value
+    channels: Optional[List[str]] = None
+    times: Optional[List[str]] = None
+    interval_minutes: Optional[int] = None
+    exclude_posts: List[int] = []
+    # Return 202 with a job id instead of waiting for every send
+    background: bool = False
 
-        form_data = await request.form()
-        times = form_data.getlist('times[]')
-        print(f"📝 Raw times from form: {times}")
-
-        if times:
-            # Handle custom times from frontend
-            for entry in times:
-                if '|' in entry:
-                    post_str, time_str = entry.split('|', 1)
-                    try:
-                        post_num = int(post_str.strip())
-                        full_time = f"{start_dt.date()}T{time_str.strip()}"
-                        dt_time = parse_custom_time(time_str.strip(), start_dt)
-                        if not dt_time:
-                            print(f"⚠️ Could not parse custom time: {time_str}")
-                            continue
-                        dt_time = round_to_nearest_5(ist.localize(dt_time)) if dt_time.tzinfo is None else dt_time
-
-
-                        # Ensure custom time is on the same date as the selected date
-                        if dt_time.date() != start_dt.date():
-                            return JSONResponse(status_code=400, content={
-                                "error": f"Custom time {time_str.strip()} must be on the selected date {start_dt.date()}"
-                            })
-                        
-                        # Skip if blocked (this is the key fix)
-                        if dt_time in blocked_times_ist:
-                            print(f"⚠️ Custom time {dt_time} is blocked (from GSheet). Skipping post {post_num}.")
-                            post_times[post_num] = None
-                            continue
-
-                        post_times[post_num] = dt_time
-                        assigned_slots.add(dt_time)
-                        print(f"✅ Custom time for post {post_num}: {dt_time}")
-                    except Exception as e:
-                        print(f"Invalid time format: {entry} - {e}")
-                        continue
-
-        # Get remaining available slots (excluding both blocked times and assigned slots)
-        remaining_available_slots = [
-            slot for slot in available_slots 
-            if slot not in assigned_slots
-        ]
-        remaining_available_slots.sort()
 
-        # Assign remaining posts
-        unassigned_posts = [num for num in all_post_nums if num not in post_times]
-        
-        if interval_minutes > 0:
-            # Fixed interval scheduling - only use available slots
-            current_slot_index = 0
-            current = start_dt
-            
-            for post_num in unassigned_posts:
-                # Find next available slot at or after current time
-                while current_slot_index < len(remaining_available_slots):
-                    if remaining_available_slots[current_slot_index] >= current:
-                        slot = remaining_available_slots[current_slot_index]
-                        post_times[post_num] = slot
-                        assigned_slots.add(slot)
-                        remaining_available_slots.pop(current_slot_index)
-                        print(f"✅ Interval scheduling: Post {post_num} at {slot}")
-                        break
-                    current_slot_index += 1
-                else:
-                    # No more available slots
-                    post_times[post_num] = None
-                    print(f"⚠️ No available slot for post {post_num}")
-                
-                current += timedelta(minutes=interval_minutes)
+@app.post("/api/auto-schedule/commit")
+async def commit_auto_schedule(body: CommitPlanRequest):
+    """
+    Schedule a stored plan. Without edited times or interval the previewed slots are
+    claimed exactly as shown (409 if any was taken since); edits re-plan the batch.
+    """
+    # Validate against the stored plan first: a rejected commit must not consume it
+    plan = scheduling_plans.get(body.plan_id)
+    if plan is None:
+        return JSONResponse(status_code=404, content={"error": "Plan not found or expired"})
+
+    text_posts = plan["text_posts"]
+    image_map = plan["image_map"]
+    selected_channels = body.channels if body.channels is not None else plan["channels"]
+    if not selected_channels:
+        return JSONResponse(status_code=400, content={"error": "Please select at least one channel"})
+    times = body.times if body.times is not None else plan["times"]
+    interval_minutes = body.interval_minutes if body.interval_minutes is not None else plan["interval_minutes"]
+
+    excluded = set(body.exclude_posts)
+    if not body.send_image_only:
+        excluded.update(num for num in image_map if num not in text_posts)
+    all_post_nums = sorted((set(text_posts.keys()) | set(image_map.keys())) - excluded)
+    if not all_post_nums:
+        return JSONResponse(status_code=400, content={"error": "No valid posts detected."})
+
+    plan = scheduling_plans.take(body.plan_id)
+    if plan is None:
+        # Committed by a concurrent request in the meantime
+        return JSONResponse(status_code=404, content={"error": "Plan not found or expired"})
+
+    workspace = plan["workspace"]
+    schedule = None
+    try:
+        if body.times is None and body.interval_minutes is None:
+            schedule = await claim_planned_batch(all_post_nums, selected_channels, plan["start_dt"], plan["end_dt"], plan["post_times"])
         else:
-            # Auto distribute evenly across remaining available slots
-            if len(unassigned_posts) <= len(remaining_available_slots):
-                if len(unassigned_posts) > 1:
-                    # Distribute evenly across available slots
-                    step = len(remaining_available_slots) // len(unassigned_posts)
-                    step = max(1, step)  # At least step of 1
-                else:
-                    step = 0
-                
-                for i, post_num in enumerate(unassigned_posts):
-                    slot_index = min(i * step, len(remaining_available_slots) - 1)
-                    slot = remaining_available_slots[slot_index]
-                    post_times[post_num] = slot
-                    assigned_slots.add(slot)
-                    print(f"✅ Auto distribute: Post {post_num} at {slot}")
-            else:
-                # More posts than available slots - assign what we can
-                for i, post_num in enumerate(unassigned_posts):
-                    if i < len(remaining_available_slots):
-                        slot = remaining_available_slots[i]
-                        post_times[post_num] = slot
-                        assigned_slots.add(slot)
-                        print(f"✅ Auto distribute: Post {post_num} at {slot}")
-                    else:
-                        post_times[post_num] = None
-                        print(f"⚠️ No available slot for post {post_num}")
-
-        # Create time slots for frontend display
-        all_blocked_times = blocked_times_ist | assigned_slots
-        time_slots_for_frontend = []
-        for slot in ui_grid:
-            status = "blocked" if slot in blocked_times_ist else ("assigned" if slot in assigned_slots else "free")
-            time_slots_for_frontend.append({
-                "time": slot.strftime("%Y-%m-%d %H:%M"),
-                "status": status
-            })
+            schedule = await plan_batch(all_post_nums, selected_channels, plan["start_dt"], plan["end_dt"], times, interval_minutes)
+        if body.background:
+            response = start_batch_job(workspace, selected_channels, all_post_nums, image_map, text_posts, schedule)
+            workspace = schedule = None
+            return response
+        return JSONResponse(await execute_batch(selected_channels, all_post_nums, image_map, text_posts, schedule))
+
+    except PlanRejected as e:
+        # Bad edited times: keep the plan (and its uploads) so the commit can be retried
+        scheduling_plans.restore(body.plan_id, plan)
+        workspace = None
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except SlotsTaken as e:
+        # Keep the plan: the operator can re-plan or commit with edited times
+        scheduling_plans.restore(body.plan_id, plan)
+        workspace = None
+        return JSONResponse(status_code=409, content={"error": str(e), "posts": e.posts})
+    except Exception as e:
+        print(f"Error in /api/auto-schedule/commit: {e}")
+        return JSONResponse(status_code=500, content={"error": "Internal server error"})
+    finally:
+        if workspace is not None:
+            upload_workspaces.release(workspace)
+        if schedule is not None and schedule["reservation_token"] is not None:
+            await asyncio.to_thread(slot_reservations.release_unconfirmed, schedule["reservation_token"])
 
-        # Process and schedule posts
-        preview_posts = []
-        scheduled_count = 0
-        failed_count = 0
-        skipped_count = 0
-        
-        # Replace the section starting from "Process and schedule posts" until the return statement
-        # Process and schedule posts for each channel
-        all_results = []
-        total_scheduled = 0
-        total_failed = 0
-        total_skipped = 0
-
-        for channel_id in selected_channels:
-            if channel_id not in CHANNELS:
-                print(f"Unknown channel: {channel_id}")
-                continue
-                
-            channel_username = CHANNELS[channel_id]['username']
-            print(f"Processing channel: @{channel_username}")
-            
-            channel_scheduled = 0
-            channel_failed = 0
-            channel_skipped = 0
-            channel_posts = []
-            
-            for post_num in all_post_nums:
-                scheduled_time = post_times.get(post_num)
-                image_path = image_map.get(post_num)
-                post_data = text_posts.get(post_num, {})
-                post_text = post_data.get('text') if isinstance(post_data, dict) else post_data
-                category = post_data.get('category') if isinstance(post_data, dict) else None
-                custom_time = post_data.get('custom_time') if isinstance(post_data, dict) else None
-
-                if not scheduled_time:
-                    channel_posts.append({
-                        "post": post_num,
-                        "image": os.path.basename(image_path) if image_path else None,
-                        "text": post_text,
-                        "category": category,
-                        "custom_time": custom_time,
-                        "time": "N/A",
-                        "status": "skipped",
-                        "error": "No available slot within selected window",
-                        "channel": f"@{channel_username}"
-                    })
-                    channel_skipped += 1
-                    continue
 
-                # Double-check: don't schedule on blocked times
-                if scheduled_time in blocked_times_ist:
-                    channel_posts.append({
-                        "post": post_num,
-                        "image": os.path.basename(image_path) if image_path else None,
-                        "text": post_text,
-                        "category": category,
-                        "custom_time": custom_time,
-                        "time": scheduled_time.strftime("%H:%M"),
-                        "status": "skipped",
-                        "error": "Time slot is blocked in Google Sheet",
-                        "channel": f"@{channel_username}"
-                    })
-                    channel_skipped += 1
-                    continue
+@app.get("/api/auto-schedule/plans/stats")
+async def get_plan_stats():
+    return scheduling_plans.stats()
 
-                # Schedule the post
-                if not scheduled_time:
-                    continue
-                schedule_time = to_utc_naive(scheduled_time)
-                try:
-                    await send_telegram_message(
-                        image_path=image_map.get(post_num),
-                        post_text=post_text,
-                        post_number=post_num,
-                        category=category,
-                        schedule_time=schedule_time,
-                        channel_username=channel_username,
-                        channel_id=channel_id
-                    )
-                    channel_scheduled += 1
-                    status = "scheduled"
-                    error = None
-                    print(f"Scheduled post {post_num} to @{channel_username} at {scheduled_time}")
-                except Exception as e:
-                    status = "failed"
-                    error = str(e)
-                    channel_failed += 1
-                    print(f"Failed to schedule post {post_num} to @{channel_username}: {e}")
-
-                channel_posts.append({
-                    "post": post_num,
-                    "image": os.path.basename(image_path) if image_path else None,
-                    "text": post_text,
-                    "category": category,
-                    "time": scheduled_time.strftime("%H:%M") if scheduled_time else "N/A",
-                    "status": status,
-                    "error": error,
-                    "channel": f"@{channel_username}"
-                })
-            
-            # Add channel results
-            all_results.extend(channel_posts)
-            total_scheduled += channel_scheduled
-            total_failed += channel_failed
-            total_skipped += channel_skipped
-            
-            print(f"Channel @{channel_username}: {channel_scheduled} scheduled, {channel_failed} failed, {channel_skipped} skipped")
 
-        return JSONResponse({
-            "status": f"Scheduled {total_scheduled} posts across {len(selected_channels)} channels, {total_failed} failed, {total_skipped} skipped",
-            "posts": all_results,
-            "scheduled": total_scheduled,
-            "failed": total_failed,
-            "skipped": total_skipped,
-            "total": len(all_post_nums) * len(selected_channels),
-            "blocked_slots": len(blocked_times_ist),
-            "time_slots": time_slots_for_frontend,
-            "channels_processed": len(selected_channels)
-        })
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str, since: int = Query(0, ge=0)):
+    """Job progress; `since` skips posts the client has already seen"""
+    job = batch_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job.snapshot(since)
+
+
+@app.get("/api/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, request: Request):
+    """Server-Sent Events: one "post" event per handled post, then "done" (the auto-schedule payload) or "error" """
+    job = batch_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    last_event_id = request.headers.get("last-event-id", "")
+    return StreamingResponse(
+        job.events(int(last_event_id) if last_event_id.isdigit() else -1),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-    except Exception as e:
-        print(f"Error in /api/auto-schedule: {e}")
-        return JSONResponse(status_code=500, content={"error": "Internal server error"})
+
+@app.get("/api/jobs")
+async def get_job_stats():
+    return batch_jobs.stats()
 
 
 class ReadPostsRequest(BaseModel):
     channel: str
     start_time: datetime
     end_time: datetime
+    refresh: bool = False  # re-read every view count now (stale ones, past MESSAGE_VIEWS_TTL_SECONDS, are re-read anyway)
 
 def extract_links(text: str):
     if not text:
@@ -509,50 +864,57 @@ def normalize_post(post_info):
         "Whatsapp-clicks": post_info.get("Whatsapp-clicks", 0),
     }
 
+def post_info_from_index_row(row, channel):
+    """Live post dict (as returned by /api/read-posts) for a message_index row"""
+    msg_date_ist = row["date"].astimezone(ist)
+    text_content = row["text"] or ""
+    links = row["links"]
+
+    post_info = {
+        "id": row["id"],
+        "time": msg_date_ist.strftime("%Y-%m-%d %H:%M:%S"),
+        "views": row["views"] or 0,
+        "Telegram-clicks": 0,
+        "Whatsapp-clicks": 0,
+        "text": text_content,
+        "links": links,
+        "channel": channel,
+        "category": "",
+        "status": "Live",
+        "media_type": row["media_type"]
+    }
+
+    if row["media_type"] == "image" and not text_content.strip() and not links:
+        post_info["text"] = "📸 Image post (no text or links)"
+
+    return post_info
+
 # main.py - Updated to include Views in the current flow
 
 @app.post("/api/read-posts")
 async def read_posts(req: ReadPostsRequest):
     posts_data = []
+    click_requests = []
     start_time_utc = req.start_time.astimezone(pytz.UTC)
     end_time_utc = req.end_time.astimezone(pytz.UTC)
 
-    async with TelegramClient(StringSession(session_string), api_id, api_hash) as client:
-        async for msg in client.iter_messages(req.channel, offset_date=end_time_utc):
-            if msg.date is None:
-                continue
-            msg_date_utc = msg.date.replace(tzinfo=pytz.UTC)
-            if not (start_time_utc <= msg_date_utc <= end_time_utc):
-                continue
+    client = await client_manager.get_client()
+    peer = await peer_cache.resolve(client, req.channel)
+    await message_index.ensure_window(client, req.channel, peer, start_time_utc, end_time_utc, refresh=req.refresh)
 
-            msg_date_ist = msg_date_utc.astimezone(pytz.timezone("Asia/Kolkata"))
-            text_content = msg.text if msg.text else ""
-            links = extract_links(text_content)
-
-            # Get click data
-            post_date_str = msg_date_ist.strftime("%Y-%m-%d")
-            click_data = get_click_data_for_links(links, post_date_str)
-
-            post_info = {
-                "id": msg.id,
-                "time": msg_date_ist.strftime("%Y-%m-%d %H:%M:%S"),
-                "views": msg.views if hasattr(msg, "views") and msg.views else 0,
-                "Telegram-clicks": click_data["telegram_clicks"],
-                "Whatsapp-clicks": click_data["whatsapp_clicks"],
-                "text": text_content,
-                "links": links,
-                "channel": req.channel,
-                "category": "",
-                "status": "Live",
-                "media_type": "image" if msg.media else "text"
-            }
-
-            if msg.media and not text_content.strip() and not links:
-                post_info["text"] = "📸 Image post (no text or links)"
+    for row in message_index.messages(req.channel, start_time_utc, end_time_utc):
+        post_info = post_info_from_index_row(row, req.channel)
+        # Click data is filled in below, one concurrent fetch for all posts
+        click_requests.append((post_info["links"], post_info["time"].split(" ")[0]))
+        posts_data.append(post_info)
 
-            posts_data.append(post_info)
+    click_results = await click_client.get_click_data_for_posts(click_requests)
+    for post_info, click_data in zip(posts_data, click_results):
+        post_info["Telegram-clicks"] = click_data["telegram_clicks"]
+        post_info["Whatsapp-clicks"] = click_data["whatsapp_clicks"]
 
-    save_msg = save_posts_to_channel_date_sheets(posts_data, req.channel, scheduled=False)
+    # Sheets writes and click lookups block; keep them off the event loop
+    save_msg = await asyncio.to_thread(save_posts_to_channel_date_sheets, posts_data, req.channel, scheduled=False)
     return {
         "status": "success",
         "count": len(posts_data),
@@ -565,36 +927,125 @@ async def read_posts(req: ReadPostsRequest):
         "channel": req.channel
     }
 
+@app.post("/api/read-posts/stream")
+async def read_posts_stream(req: ReadPostsRequest):
+    """
+    /api/read-posts as NDJSON: one post per line as soon as Telegram yields it and its
+    clicks resolve, newest first, then a {"type": "summary"} line after the sheet save.
+    """
+    start_time_utc = req.start_time.astimezone(pytz.UTC)
+    end_time_utc = req.end_time.astimezone(pytz.UTC)
+
+    client = await client_manager.get_client()
+    peer = await peer_cache.resolve(client, req.channel)
+
+    # Bounded: the producer waits when the reader falls behind, which also caps in-flight click lookups
+    queue = asyncio.Queue(maxsize=READ_POSTS_STREAM_BUFFER)
+    done = object()
+
+    async def produce():
+        try:
+            async for msg in telegram_limiter.iter_messages(client, peer, offset_date=end_time_utc):
+                if msg.date is None:
+                    continue
+                if msg.date < start_time_utc:
+                    break
+                row = row_from_message(msg)
+                message_index.upsert(req.channel, [row])
+                post_info = post_info_from_index_row({**row, "date": msg.date}, req.channel)
+                clicks = asyncio.create_task(click_client.get_click_data_for_links(
+                    post_info["links"], post_info["time"].split(" ")[0]
+                ))
+                await queue.put((post_info, clicks))
+        except Exception as e:
+            await queue.put(e)
+        finally:
+            await queue.put(done)
+
+    async def stream():
+        posts_data = []
+        error = None
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    error = item
+                    continue
+                post_info, clicks = item
+                click_data = await clicks
+                post_info["Telegram-clicks"] = click_data["telegram_clicks"]
+                post_info["Whatsapp-clicks"] = click_data["whatsapp_clicks"]
+                posts_data.append(post_info)
+                yield json.dumps(post_info, ensure_ascii=False) + "\n"
+
+            if error is not None:
+                print(f"❌ Streaming posts for @{req.channel} stopped: {error}")
+                save_msg = f"Stopped after {len(posts_data)} posts: {error}"
+            else:
+                save_msg = await asyncio.to_thread(
+                    save_posts_to_channel_date_sheets, posts_data, req.channel, False
+                )
+            yield json.dumps({
+                "type": "summary",
+                "status": "error" if error is not None else "success",
+                "count": len(posts_data),
+                "message": save_msg,
+                "date_range": {
+                    "start": req.start_time.strftime("%d %b %Y"),
+                    "end": req.end_time.strftime("%d %b %Y")
+                },
+                "channel": req.channel
+            }, ensure_ascii=False) + "\n"
+        finally:
+            # Client went away or we finished: stop reading history and drop pending lookups
+            producer.cancel()
+            while not queue.empty():
+                item = queue.get_nowait()
+                if isinstance(item, tuple):
+                    item[1].cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
 @app.post("/api/scheduled-posts")
 async def read_scheduled_messages(req: ReadPostsRequest):
     scheduled_posts = []
+    click_requests = []
+
+    client = await client_manager.get_client()
+    peer = await peer_cache.resolve(client, req.channel)
+    scheduled_messages = await scheduled_history.get(client, req.channel, peer)
+    for msg in scheduled_messages:
+        msg_date_ist = msg.date.astimezone(pytz.timezone("Asia/Kolkata")) if msg.date else datetime.now().astimezone(pytz.timezone("Asia/Kolkata"))
+        text_content = msg.message or ""
+        links = extract_links(text_content)
+
+        post_date_str = msg_date_ist.strftime("%Y-%m-%d")
+        click_requests.append((links, post_date_str))
+
+        post_info = {
+            "id": msg.id,
+            "time": msg_date_ist.strftime("%Y-%m-%d %H:%M:%S"),
+            "views": 0,  # Scheduled posts don't have views yet
+            "text": text_content if text_content.strip() else "📸 Image post (no text or links)",
+            "links": links,
+            "channel": req.channel,
+            "category": "",
+            "status": "Scheduled",
+            "Telegram-clicks": 0,
+            "Whatsapp-clicks": 0,
+        }
 
-    async with TelegramClient(StringSession(session_string), api_id, api_hash) as client:
-        result = await client(GetScheduledHistoryRequest(peer=req.channel, hash=0))
-        for msg in result.messages:
-            msg_date_ist = msg.date.astimezone(pytz.timezone("Asia/Kolkata")) if msg.date else datetime.now().astimezone(pytz.timezone("Asia/Kolkata"))
-            text_content = msg.message or ""
-            links = extract_links(text_content)
-
-            post_date_str = msg_date_ist.strftime("%Y-%m-%d")
-            click_data = get_click_data_for_links(links, post_date_str)
-
-            post_info = {
-                "id": msg.id,
-                "time": msg_date_ist.strftime("%Y-%m-%d %H:%M:%S"),
-                "views": 0,  # Scheduled posts don't have views yet
-                "text": text_content if text_content.strip() else "📸 Image post (no text or links)",
-                "links": links,
-                "channel": req.channel,
-                "category": "",
-                "status": "Scheduled",
-                "Telegram-clicks": click_data["telegram_clicks"],
-                "Whatsapp-clicks": click_data["whatsapp_clicks"],
-            }
+        scheduled_posts.append(post_info)
 
-            scheduled_posts.append(post_info)
+    click_results = await click_client.get_click_data_for_posts(click_requests)
+    for post_info, click_data in zip(scheduled_posts, click_results):
+        post_info["Telegram-clicks"] = click_data["telegram_clicks"]
+        post_info["Whatsapp-clicks"] = click_data["whatsapp_clicks"]
 
-    save_msg = save_posts_to_channel_date_sheets(scheduled_posts, req.channel, scheduled=True)
+    save_msg = await asyncio.to_thread(save_posts_to_channel_date_sheets, scheduled_posts, req.channel, scheduled=True)
     return {
         "status": "success",
         "count": len(scheduled_posts),
@@ -604,9 +1055,13 @@ async def read_scheduled_messages(req: ReadPostsRequest):
 @app.get("/api/posts-summary")
 async def get_posts_summary(
     date: str = Query(..., description="Date in YYYY-MM-DD format"),
-    channels: str = Query(None, description="Comma-separated channel IDs")
+    channels: str = Query(None, description="Comma-separated channel IDs"),
+    count_mode: str = Query("index", description="index (local message index), offset (constant API calls) or scan (walk history)"),
+    refresh: bool = Query(False, description="Sync the message index from Telegram before counting")
 ):
     results = []
+    if count_mode not in COUNT_MODES:
+        raise HTTPException(status_code=400, detail=f"count_mode must be one of {', '.join(COUNT_MODES)}")
     
     try:
         target_date = datetime.strptime(date, "%Y-%m-%d")
@@ -625,73 +1080,60 @@ async def get_posts_summary(
         channel_ids = [id.strip() for id in channels.split(",")]
         target_channels = {k: v for k, v in CHANNELS.items() if k in channel_ids}
     
-    async with TelegramClient(StringSession(session_string), api_id, api_hash) as client:
-        for channel_id, data in target_channels.items():
-            username = data["username"]
+    client = await client_manager.get_client()
+    for channel_id, data in target_channels.items():
+        username = data["username"]
+        try:
+            entity = await peer_cache.resolve(client, username)
+            
+            if count_mode == "index":
+                await message_index.ensure_window(client, username, entity, start_of_day, end_of_day, refresh=refresh)
+                live_count = message_index.count(username, start_of_day, start_of_day + timedelta(days=1))
+            else:
+                live_count = await count_live_posts(
+                    client, entity, start_of_day, start_of_day + timedelta(days=1), count_mode
+                )
+            
+            print(f"📊 Found {live_count} live messages for @{username} on {date}")
+            
+            scheduled_count = 0
             try:
-                entity = await client.get_entity(username)
-                
-                live_count = 0
-                messages_found = []
-                async for message in client.iter_messages(
-                    entity,
-                    limit=None,
-                    reverse=False
-                ):
-                    msg_date = message.date
-                    if msg_date.tzinfo is None:
-                        msg_date = msg_date.replace(tzinfo=timezone.utc)
-                    elif msg_date.tzinfo != timezone.utc:
-                        msg_date = msg_date.astimezone(timezone.utc)
-                    
-                    if msg_date >= start_of_day and msg_date <= end_of_day:
-                        messages_found.append(message)
-                        live_count += 1
-                    elif msg_date < start_of_day:
-                        break
+                scheduled_messages = await scheduled_history.get(client, username, entity)
                 
-                print(f"📊 Found {live_count} live messages for @{username} on {date}")
-                
-                scheduled_count = 0
-                try:
-                    scheduled_result = await client(
-                        GetScheduledHistoryRequest(peer=entity, hash=0)
-                    )
-                    
-                    if hasattr(scheduled_result, 'messages'):
-                        for msg in scheduled_result.messages:
-                            sched_date = msg.date
-                            if sched_date.tzinfo is None:
-                                sched_date = sched_date.replace(tzinfo=timezone.utc)
-                            elif sched_date.tzinfo != timezone.utc:
-                                sched_date = sched_date.astimezone(timezone.utc)
-                            
-                            if sched_date >= start_of_day and sched_date <= end_of_day:
-                                scheduled_count += 1
-                    
-                    print(f"📊 Found {scheduled_count} scheduled messages for @{username} on {date}")
+                for msg in scheduled_messages:
+                    sched_date = msg.date
+                    if sched_date.tzinfo is None:
+                        sched_date = sched_date.replace(tzinfo=timezone.utc)
+                    elif sched_date.tzinfo != timezone.utc:
+                        sched_date = sched_date.astimezone(timezone.utc)
                     
-                except Exception as sched_err:
-                    print(f"⚠️ Could not fetch scheduled posts for @{username}: {sched_err}")
+                    if sched_date >= start_of_day and sched_date <= end_of_day:
+                        scheduled_count += 1
                 
-                results.append({
-                    "channel_id": channel_id,
-                    "channel_username": username,
-                    "live_posts": live_count,
-                    "scheduled_posts": scheduled_count,
-                })
-                
-                print(f"✅ @{username}: Live = {live_count}, Scheduled = {scheduled_count}")
+                print(f"📊 Found {scheduled_count} scheduled messages for @{username} on {date}")
                 
-            except Exception as e:
-                print(f"⚠️ Failed to get data for @{username}: {e}")
-                results.append({
-                    "channel_id": channel_id,
-                    "channel_username": username,
-                    "live_posts": 0,
-                    "scheduled_posts": 0,
-                    "error": str(e)
-                })
+            except Exception as sched_err:
+                print(f"⚠️ Could not fetch scheduled posts for @{username}: {sched_err}")
+            
+            results.append({
+                "channel_id": channel_id,
+                "channel_username": username,
+                "live_posts": live_count,
+                "scheduled_posts": scheduled_count,
+            })
+            
+            print(f"✅ @{username}: Live = {live_count}, Scheduled = {scheduled_count}")
+            
+        except Exception as e:
+            print(f"⚠️ Failed to get data for @{username}: {e}")
+            peer_cache.invalidate_on_error(username, e)
+            results.append({
+                "channel_id": channel_id,
+                "channel_username": username,
+                "live_posts": 0,
+                "scheduled_posts": 0,
+                "error": str(e)
+            })
     
     total_live = sum(ch.get("live_posts", 0) for ch in results)
     total_scheduled = sum(ch.get("scheduled_posts", 0) for ch in results)
@@ -708,6 +1150,23 @@ async def get_posts_summary(
         }
     }
 
+@app.get("/api/clicks/cache-stats")
+async def get_click_cache_stats():
+    return click_cache.stats()
+
+@app.get("/api/telegram/scheduled-cache-stats")
+async def get_scheduled_cache_stats():
+    return scheduled_history.stats()
+
+@app.get("/api/telegram/rate-limits")
+async def get_telegram_rate_limits():
+    """Per-lane call counts and time spent waiting on the token buckets and on flood waits"""
+    return telegram_limiter.stats()
+
+@app.get("/api/slot-reservations/stats")
+async def get_slot_reservation_stats():
+    return await asyncio.to_thread(slot_reservations.stats)
+
 @app.get("/api/channels")
 async def get_available_channels():
     channels_list = []
@@ -728,7 +1187,9 @@ async def get_available_channels():
 async def get_posts_range(
     start_date: str = Query(..., description="Start date in YYYY-MM-DD format"),
     end_date: str = Query(..., description="End date in YYYY-MM-DD format"),
-    channels: str = Query(None, description="Comma-separated channel IDs")
+    channels: str = Query(None, description="Comma-separated channel IDs"),
+    count_mode: str = Query("index", description="index (local message index), offset (constant API calls) or scan (walk history)"),
+    refresh: bool = Query(False, description="Sync the message index from Telegram before counting")
 ):
     """
     Get posts for a date range with optional channel filtering.
@@ -736,6 +1197,8 @@ async def get_posts_range(
     Example: /api/posts-range?start_date=2025-09-01&end_date=2025-09-30&channels=1,2
     """
     results = []
+    if count_mode not in COUNT_MODES:
+        raise HTTPException(status_code=400, detail=f"count_mode must be one of {', '.join(COUNT_MODES)}")
     
     try:
         start = datetime.strptime(start_date, "%Y-%m-%d").replace(tzinfo=timezone.utc)
@@ -744,9 +1207,9 @@ async def get_posts_range(
         if start > end:
             raise HTTPException(status_code=400, detail="start_date must be before end_date")
             
-        # Check if date range is too large (optional safety check)
+        # Walking history is only bounded for the scan mode; index/offset cost does not grow with the range
         date_diff = (end - start).days
-        if date_diff > 31:
+        if count_mode == "scan" and date_diff > 31:
             raise HTTPException(status_code=400, detail="Date range cannot exceed 31 days")
             
     except ValueError:
@@ -758,70 +1221,58 @@ async def get_posts_range(
         channel_ids = [id.strip() for id in channels.split(",")]
         target_channels = {k: v for k, v in CHANNELS.items() if k in channel_ids}
     
-    async with TelegramClient(StringSession(session_string), api_id, api_hash) as client:
-        for channel_id, data in target_channels.items():
-            username = data["username"]
+    client = await client_manager.get_client()
+    for channel_id, data in target_channels.items():
+        username = data["username"]
+        try:
+            entity = await peer_cache.resolve(client, username)
+            
+            # Count live posts in range (end is inclusive to the second)
+            if count_mode == "index":
+                await message_index.ensure_window(client, username, entity, start, end, refresh=refresh)
+                live_count = message_index.count(username, start, end + timedelta(seconds=1))
+            else:
+                live_count = await count_live_posts(
+                    client, entity, start, end + timedelta(seconds=1), count_mode
+                )
+            
+            # Count scheduled posts in range
+            scheduled_count = 0
             try:
-                entity = await client.get_entity(username)
-                
-                # Count live posts in range
-                live_count = 0
-                async for message in client.iter_messages(
-                    entity,
-                    limit=None,
-                    reverse=False
-                ):
-                    # Convert message date to UTC
-                    msg_date = message.date
-                    if msg_date.tzinfo is None:
-                        msg_date = msg_date.replace(tzinfo=timezone.utc)
-                    elif msg_date.tzinfo != timezone.utc:
-                        msg_date = msg_date.astimezone(timezone.utc)
-                    
-                    if msg_date >= start and msg_date <= end:
-                        live_count += 1
-                    elif msg_date < start:
-                        break
+                scheduled_messages = await scheduled_history.get(client, username, entity)
                 
-                # Count scheduled posts in range
-                scheduled_count = 0
-                try:
-                    scheduled_result = await client(
-                        GetScheduledHistoryRequest(peer=entity, hash=0)
-                    )
+                for msg in scheduled_messages:
+                    sched_date = msg.date
+                    if sched_date.tzinfo is None:
+                        sched_date = sched_date.replace(tzinfo=timezone.utc)
+                    elif sched_date.tzinfo != timezone.utc:
+                        sched_date = sched_date.astimezone(timezone.utc)
                     
-                    if hasattr(scheduled_result, 'messages'):
-                        for msg in scheduled_result.messages:
-                            sched_date = msg.date
-                            if sched_date.tzinfo is None:
-                                sched_date = sched_date.replace(tzinfo=timezone.utc)
-                            elif sched_date.tzinfo != timezone.utc:
-                                sched_date = sched_date.astimezone(timezone.utc)
+                    if sched_date >= start and sched_date <= end:
+                        scheduled_count += 1
                             
-                            if sched_date >= start and sched_date <= end:
-                                scheduled_count += 1
-                                
-                except Exception as sched_err:
-                    print(f"⚠️ Could not fetch scheduled posts for @{username}: {sched_err}")
-                
-                results.append({
-                    "channel_id": channel_id,
-                    "channel_username": username,
-                    "live_posts": live_count,
-                    "scheduled_posts": scheduled_count,
-                })
-                
-                print(f"✅ @{username} ({start_date} to {end_date}): Live = {live_count}, Scheduled = {scheduled_count}")
-                
-            except Exception as e:
-                print(f"⚠️ Failed to get data for @{username}: {e}")
-                results.append({
-                    "channel_id": channel_id,
-                    "channel_username": username,
-                    "live_posts": 0,
-                    "scheduled_posts": 0,
-                    "error": str(e)
-                })
+            except Exception as sched_err:
+                print(f"⚠️ Could not fetch scheduled posts for @{username}: {sched_err}")
+            
+            results.append({
+                "channel_id": channel_id,
+                "channel_username": username,
+                "live_posts": live_count,
+                "scheduled_posts": scheduled_count,
+            })
+            
+            print(f"✅ @{username} ({start_date} to {end_date}): Live = {live_count}, Scheduled = {scheduled_count}")
+            
+        except Exception as e:
+            print(f"⚠️ Failed to get data for @{username}: {e}")
+            peer_cache.invalidate_on_error(username, e)
+            results.append({
+                "channel_id": channel_id,
+                "channel_username": username,
+                "live_posts": 0,
+                "scheduled_posts": 0,
+                "error": str(e)
+            })
     
     # Calculate totals
     total_live = sum(ch.get("live_posts", 0) for ch in results)
@@ -876,38 +1327,38 @@ def save_to_excel(posts, filename="posts.xlsx"):
     return filename
 
 
-@app.get("/api/calendar-slots")
-def get_calendar_slots(date: str = Query(..., description="Format: YYYY-MM-DD")):
-    log_file = os.path.join("logs", "post_logs.xlsx")
-    if not os.path.exists(log_file):
-        return []
+calendar_slots = CalendarSlotIndex(status_journal)
 
+@app.get("/api/calendar-slots")
+def get_calendar_slots(
+    date: str = Query(..., description="Format: YYYY-MM-DD"),
+    channel: str = Query(None, description="Only slots of this channel username")
+):
     try:
-        df = pd.read_excel(log_file)
-        df['Date'] = pd.to_datetime(df['Date'], errors='coerce').dt.date
-        df['Time'] = pd.to_datetime(df['Time'], format='%H:%M:%S', errors='coerce').dt.time
-
-        # Filter by requested date
         selected_date = datetime.strptime(date, "%Y-%m-%d").date()
-        day_posts = df[df['Date'] == selected_date]
-
-        slots = []
-        for _, row in day_posts.iterrows():
-            if pd.isna(row['Time']):
-                continue
-            full_datetime = datetime.combine(row['Date'], row['Time'])
-            slots.append({
-                "time": full_datetime.isoformat(),
-                "status": "booked",
-                "post": row['Post Number']
-            })
-
-        return slots
+        return calendar_slots.day(selected_date, channel)
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
+@app.get("/api/calendar-slots/month")
+def get_calendar_month_slots(
+    month: str = Query(..., description="Format: YYYY-MM"),
+    channel: str = Query(None, description="Only slots of this channel username")
+):
+    try:
+        selected = datetime.strptime(month, "%Y-%m")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="month must be YYYY-MM")
+    days = calendar_slots.month(selected.year, selected.month, channel)
+    return {
+        "month": month,
+        "total": sum(len(slots) for slots in days.values()),
+        "days": days
+    }
+
 @app.post("/api/bulk-schedule")
 async def bulk_schedule(background_tasks: BackgroundTasks, files: List[UploadFile] = File(...), schedule_data: str = Form(...)):
+    workspace = None
     try:
         # Clear previous uploads
         print("Received schedule_data:", schedule_data)
@@ -918,19 +1369,22 @@ async def bulk_schedule(background_tasks: BackgroundTasks, files: List[UploadFil
         else:
             # fallback for old format
             post_time_map = {item['post']: item['time'] for item in schedule_list if item['time']}
-        for f in os.listdir(UPLOAD_DIR):
-            os.remove(os.path.join(UPLOAD_DIR, f))
+        workspace = upload_workspaces.create()
 
         image_files = {}
         text_paths = []
+        text_posts = {}
 
-        # Save uploaded files
+        # Save uploaded files (text files are parsed while they are written to disk)
         for file in files:
-            file_path = os.path.join(UPLOAD_DIR, file.filename)
-            with open(file_path, "wb") as f:
-                f.write(await file.read())
-
             name_lower = file.filename.lower().replace(" ", "").replace("_", "")
+            if name_lower.endswith(".txt"):
+                stored, file_posts = await workspace.save_text(file)
+                text_posts.update(file_posts)
+            else:
+                stored = await workspace.save(file)
+            file_path = stored["path"]
+
             if name_lower.endswith(".txt"):
                 text_paths.append(file_path)
             elif name_lower.endswith((".jpg", ".jpeg", ".png")):
@@ -947,12 +1401,6 @@ async def bulk_schedule(background_tasks: BackgroundTasks, files: List[UploadFil
        # Extract post numbers from both image filenames and text files
         image_post_nums = set(image_files.keys())
 
-        txt_contents = []
-        for path in text_paths:
-            with open(path, 'r', encoding='utf-8') as f:
-                txt_contents.append(f.read())
-
-        text_posts = extract_all_posts_from_texts(txt_contents)
         text_post_nums = set(text_posts.keys())
 
         # A post is defined by having either image or text (or both), but only counted once
@@ -989,4 +1437,7 @@ async def bulk_schedule(background_tasks: BackgroundTasks, files: List[UploadFil
         return JSONResponse({"status": f"{len(all_post_nums)} posts scheduled successfully"})
 
     except Exception as e:
-        return JSONResponse(status_code=500, content={"error": str(e)})
\ No newline at end of file
+        return JSONResponse(status_code=500, content={"error": str(e)})
+    finally:
+        if workspace is not None:
+            upload_workspaces.release(workspace)
\ No newline at end of file
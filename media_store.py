@@ -0,0 +1,62 @@
+# media_store.py
+# Content-addressed copies of uploaded media, so queued work does not depend on uploads/ surviving.
+
+import hashlib
+import os
+import shutil
+import time
+from app_state import STATE_DIR
+
+MEDIA_STORE_DIR = os.path.join(STATE_DIR, "media")
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def blob_path(digest: str, ext: str = "") -> str:
+    return os.path.join(MEDIA_STORE_DIR, f"{digest}{ext.lower()}")
+
+
+def store_file(path: str) -> str:
+    """Durable path for the contents of `path`; identical files share one blob"""
+    ext = os.path.splitext(path)[1]
+    target = blob_path(file_sha256(path), ext)
+    if os.path.exists(target):
+        return target
+
+    os.makedirs(MEDIA_STORE_DIR, exist_ok=True)
+    tmp_path = f"{target}.{os.getpid()}.tmp"
+    try:
+        # Same filesystem: a hardlink costs nothing and survives the upload being deleted
+        os.link(path, tmp_path)
+    except OSError:
+        shutil.copyfile(path, tmp_path)
+    os.replace(tmp_path, target)
+    return target
+
+
+def sweep(keep_paths, min_age_seconds: int = 24 * 3600) -> int:
+    """Delete blobs not in keep_paths and older than min_age_seconds; returns how many were removed"""
+    if not os.path.isdir(MEDIA_STORE_DIR):
+        return 0
+    keep = {os.path.abspath(p) for p in keep_paths if p}
+    cutoff = time.time() - min_age_seconds
+    removed = 0
+    for name in os.listdir(MEDIA_STORE_DIR):
+        path = os.path.abspath(os.path.join(MEDIA_STORE_DIR, name))
+        if path in keep:
+            continue
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            continue
+    return removed
@@ -0,0 +1,247 @@
+# message_index.py
+# Local SQLite index of channel history, synced incrementally from Telegram.
+# Past messages do not change, so history queries are answered locally and
+# only messages newer than the last stored id are fetched; view counts, which do
+# change, are re-read once they are older than MESSAGE_VIEWS_TTL_SECONDS.
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from telegram_utils import extract_links
+from telegram_limiter import telegram_limiter
+from app_state import STATE_DIR, channel_key
+
+MESSAGE_INDEX_PATH = os.path.join(STATE_DIR, "message_index.sqlite")
+
+# View counts older than this are re-read from Telegram when a window is queried
+# (refresh=True re-reads them all), so read endpoints return live views
+MESSAGE_VIEWS_TTL_SECONDS = int(os.getenv("MESSAGE_VIEWS_TTL_SECONDS", "300"))
+# Views are re-read in batches of this size
+VIEWS_REFRESH_BATCH = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    channel TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    date INTEGER NOT NULL,
+    views INTEGER NOT NULL DEFAULT 0,
+    text TEXT NOT NULL DEFAULT '',
+    text_hash TEXT NOT NULL DEFAULT '',
+    links TEXT NOT NULL DEFAULT '[]',
+    media_type TEXT NOT NULL DEFAULT 'text',
+    views_at INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (channel, id)
+);
+CREATE INDEX IF NOT EXISTS idx_messages_channel_date ON messages (channel, date);
+CREATE TABLE IF NOT EXISTS sync_state (
+    channel TEXT PRIMARY KEY,
+    max_id INTEGER NOT NULL DEFAULT 0,
+    oldest_date INTEGER NOT NULL,
+    synced_at INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def _ts(dt: datetime) -> float:
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def row_from_message(message):
+    """Index row for a Telethon message"""
+    text = getattr(message, "text", None) or ""
+    return {
+        "id": message.id,
+        "date": int(_ts(message.date)),
+        "views": getattr(message, "views", None) or 0,
+        "text": text,
+        "text_hash": hashlib.sha1(text.encode("utf-8")).hexdigest(),
+        "links": extract_links(text),
+        "media_type": "image" if getattr(message, "media", None) else "text",
+    }
+
+
+class MessageIndex:
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(SCHEMA)
+        columns = {row["name"] for row in self._db.execute("PRAGMA table_info(messages)")}
+        if "views_at" not in columns:
+            # Indexes created before views were timestamped: everything counts as stale
+            self._db.execute("ALTER TABLE messages ADD COLUMN views_at INTEGER NOT NULL DEFAULT 0")
+            self._db.commit()
+        self._db_lock = threading.Lock()
+        self._sync_locks = {}
+
+    # --- storage ---
+
+    def _state(self, channel):
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT max_id, oldest_date, synced_at FROM sync_state WHERE channel = ?", (channel,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def _save_state(self, channel, max_id, oldest_date, synced_at):
+        with self._db_lock, self._db:
+            self._db.execute(
+                "INSERT INTO sync_state (channel, max_id, oldest_date, synced_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(channel) DO UPDATE SET max_id = excluded.max_id, "
+                "oldest_date = excluded.oldest_date, synced_at = excluded.synced_at",
+                (channel, max_id, oldest_date, synced_at)
+            )
+
+    def upsert(self, channel: str, rows):
+        rows = list(rows)
+        if not rows:
+            return 0
+        channel = channel_key(channel)
+        now = int(time.time())
+        with self._db_lock, self._db:
+            self._db.executemany(
+                "INSERT INTO messages (channel, id, date, views, text, text_hash, links, media_type, views_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(channel, id) DO UPDATE SET date = excluded.date, views = excluded.views, "
+                "text = excluded.text, text_hash = excluded.text_hash, links = excluded.links, "
+                "media_type = excluded.media_type, views_at = excluded.views_at",
+                [
+                    (channel, r["id"], r["date"], r["views"], r["text"], r["text_hash"],
+                     json.dumps(r["links"]), r["media_type"], now)
+                    for r in rows
+                ]
+            )
+        return len(rows)
+
+    def _update_views(self, channel, views_by_id):
+        now = int(time.time())
+        with self._db_lock, self._db:
+            self._db.executemany(
+                "UPDATE messages SET views = ?, views_at = ? WHERE channel = ? AND id = ?",
+                [(views, now, channel, msg_id) for msg_id, views in views_by_id.items()]
+            )
+
+    def _delete(self, channel, ids):
+        with self._db_lock, self._db:
+            self._db.executemany("DELETE FROM messages WHERE channel = ? AND id = ?", [(channel, msg_id) for msg_id in ids])
+
+    def _stale_view_ids(self, channel, start: datetime, end: datetime, before: int):
+        """Ids in start <= date <= end whose views were last read before `before`"""
+        with self._db_lock:
+            rows = self._db.execute(
+                "SELECT id FROM messages WHERE channel = ? AND date >= ? AND date <= ? AND views_at < ? "
+                "ORDER BY id DESC",
+                (channel, _ts(start), _ts(end), before)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    # --- queries ---
+
+    def count(self, channel: str, start: datetime, end: datetime) -> int:
+        """Messages with start <= date < end"""
+        with self._db_lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM messages WHERE channel = ? AND date >= ? AND date < ?",
+                (channel_key(channel), _ts(start), _ts(end))
+            ).fetchone()[0]
+
+    def messages(self, channel: str, start: datetime, end: datetime):
+        """Rows with start <= date <= end, newest first (same order as iter_messages)"""
+        with self._db_lock:
+            rows = self._db.execute(
+                "SELECT id, date, views, text, text_hash, links, media_type FROM messages "
+                "WHERE channel = ? AND date >= ? AND date <= ? ORDER BY date DESC, id DESC",
+                (channel_key(channel), _ts(start), _ts(end))
+            ).fetchall()
+        result = []
+        for row in rows:
+            item = dict(row)
+            item["links"] = json.loads(item["links"])
+            item["date"] = datetime.fromtimestamp(item["date"], tz=timezone.utc)
+            result.append(item)
+        return result
+
+    # --- sync ---
+
+    async def _fetch(self, client, peer, **kwargs):
+        return [row_from_message(m) async for m in telegram_limiter.iter_messages(client, peer, **kwargs) if m.date is not None]
+
+    async def ensure_window(self, client, channel: str, peer, start: datetime, end: datetime, refresh: bool = False):
+        """
+        Make the index complete for [start, end]:
+        - backfill older history once when start is before what has been synced,
+        - fetch messages newer than the last stored id (min_id) when the window reaches
+          past the last sync or refresh is requested,
+        - re-read view counts in the window that are older than MESSAGE_VIEWS_TTL_SECONDS
+          (all of them on refresh), so stored views never go stale; messages that come
+          back deleted are removed from the index.
+        """
+        key = channel_key(channel)
+        lock = self._sync_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            state = self._state(key)
+            start_ts = int(_ts(start))
+            now = int(time.time())
+
+            if state is None:
+                # First sync: everything from start up to now
+                rows = []
+                async for message in telegram_limiter.iter_messages(client, peer):
+                    if message.date is None:
+                        continue
+                    if _ts(message.date) < start_ts:
+                        break
+                    rows.append(row_from_message(message))
+                self.upsert(key, rows)
+                max_id = max((r["id"] for r in rows), default=0)
+                if max_id == 0:
+                    latest = await telegram_limiter.call("history", client.get_messages, peer, limit=1)
+                    max_id = latest[0].id if latest else 0
+                self._save_state(key, max_id, start_ts, now)
+                print(f"🗂️ Indexed {len(rows)} messages for @{key}")
+                return
+
+            if start_ts < state["oldest_date"]:
+                # Backfill the gap between the requested start and what we already hold
+                rows = []
+                offset_date = datetime.fromtimestamp(state["oldest_date"], tz=timezone.utc)
+                async for message in telegram_limiter.iter_messages(client, peer, offset_date=offset_date):
+                    if message.date is None:
+                        continue
+                    if _ts(message.date) < start_ts:
+                        break
+                    rows.append(row_from_message(message))
+                self.upsert(key, rows)
+                state["oldest_date"] = start_ts
+                self._save_state(key, state["max_id"], start_ts, state["synced_at"])
+                print(f"🗂️ Backfilled {len(rows)} older messages for @{key}")
+
+            if refresh or _ts(end) > state["synced_at"]:
+                rows = await self._fetch(client, peer, min_id=state["max_id"])
+                self.upsert(key, rows)
+                max_id = max([state["max_id"]] + [r["id"] for r in rows])
+                self._save_state(key, max_id, state["oldest_date"], now)
+                if rows:
+                    print(f"🗂️ Synced {len(rows)} new messages for @{key}")
+
+            ids = self._stale_view_ids(key, start, end, now if refresh else now - MESSAGE_VIEWS_TTL_SECONDS)
+            for i in range(0, len(ids), VIEWS_REFRESH_BATCH):
+                batch_ids = ids[i:i + VIEWS_REFRESH_BATCH]
+                batch = await telegram_limiter.call("history", client.get_messages, peer, ids=batch_ids)
+                # get_messages returns None in place of every deleted message
+                deleted = [msg_id for msg_id, m in zip(batch_ids, batch) if m is None]
+                self._update_views(key, {m.id: m.views or 0 for m in batch if m is not None})
+                if deleted:
+                    self._delete(key, deleted)
+                    print(f"🗑️ Dropped {len(deleted)} deleted messages from the index for @{key}")
+
+
+message_index = MessageIndex(MESSAGE_INDEX_PATH)
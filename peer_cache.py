@@ -0,0 +1,84 @@
+# peer_cache.py
+# Persistent username -> InputPeerChannel cache, so each channel is resolved once, not once per send.
+
+import json
+import os
+import threading
+from telethon.tl.types import InputPeerChannel
+from telethon.errors import ChannelInvalidError, ChannelPrivateError
+from telegram_limiter import telegram_limiter
+from app_state import STATE_DIR, channel_key
+
+PEER_CACHE_PATH = os.path.join(STATE_DIR, "peer_cache.json")
+
+# Errors that mean the stored id/access_hash no longer points at a usable channel
+INVALID_PEER_ERRORS = (ChannelInvalidError, ChannelPrivateError)
+
+
+class PeerCache:
+    def __init__(self, path: str):
+        self.path = path
+        self._peers = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._peers = json.load(f)
+            print(f"📇 Loaded {len(self._peers)} cached channel peers from {self.path}")
+        except Exception as e:
+            print(f"⚠️ Could not read peer cache {self.path}: {e}")
+            self._peers = {}
+
+    def _save(self):
+        # Write to a temp file first so a crash never leaves a half-written cache
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._peers, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def get(self, username: str):
+        entry = self._peers.get(channel_key(username))
+        if not entry:
+            return None
+        return InputPeerChannel(channel_id=entry["channel_id"], access_hash=entry["access_hash"])
+
+    def put(self, username: str, peer: InputPeerChannel):
+        with self._lock:
+            self._peers[channel_key(username)] = {
+                "channel_id": peer.channel_id,
+                "access_hash": peer.access_hash
+            }
+            self._save()
+
+    def invalidate(self, username: str):
+        with self._lock:
+            if self._peers.pop(channel_key(username), None) is not None:
+                print(f"🗑️ Dropped cached peer for @{channel_key(username)}")
+                self._save()
+
+    def invalidate_on_error(self, username: str, error: Exception) -> bool:
+        """Drop the cached peer if `error` says it is no longer valid"""
+        if isinstance(error, INVALID_PEER_ERRORS):
+            self.invalidate(username)
+            return True
+        return False
+
+    async def resolve(self, client, username: str):
+        """Return the input peer for username, resolving it through Telegram only on a cache miss"""
+        peer = self.get(username)
+        if peer is not None:
+            return peer
+
+        peer = await telegram_limiter.call("resolve", client.get_input_entity, username)
+        if isinstance(peer, InputPeerChannel):
+            self.put(username, peer)
+            print(f"📇 Cached peer for @{channel_key(username)}")
+        return peer
+
+
+peer_cache = PeerCache(PEER_CACHE_PATH)
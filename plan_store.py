@@ -0,0 +1,82 @@
+# plan_store.py
+# Scheduling plans kept between the plan and commit requests.
+# A plan holds the parsed posts, image map, upload workspace and proposed slots of one
+# batch, so confirming it does not re-upload or re-parse anything. Plans are single use
+# and expire after PLAN_TTL_SECONDS; on_expire cleans up whatever the plan was holding.
+
+import os
+import threading
+import time
+import uuid
+from slot_reservations import SLOT_HOLD_SECONDS
+from app_state import PeriodicReaper
+
+# How long a previewed plan can be committed. Its slots are not reserved while it waits;
+# commit checks them against the Sheet and live reservations. Defaults to the reservation hold.
+PLAN_TTL_SECONDS = int(os.getenv("PLAN_TTL_SECONDS", str(SLOT_HOLD_SECONDS)))
+PLAN_REAP_INTERVAL_SECONDS = int(os.getenv("PLAN_REAP_INTERVAL_SECONDS", "60"))
+
+
+class PlanStore(PeriodicReaper):
+    reaper_name = "Plan reaper"
+
+    def __init__(self, ttl_seconds=PLAN_TTL_SECONDS, reap_interval=PLAN_REAP_INTERVAL_SECONDS, on_expire=None):
+        self.ttl_seconds = ttl_seconds
+        self.reap_interval = reap_interval
+        self.on_expire = on_expire
+        self._plans = {}  # plan_id -> (expires_at, plan)
+        self._lock = threading.Lock()
+
+    def put(self, plan) -> str:
+        plan_id = uuid.uuid4().hex
+        with self._lock:
+            self._plans[plan_id] = (time.monotonic() + self.ttl_seconds, plan)
+        return plan_id
+
+    def get(self, plan_id: str):
+        """A live plan without consuming it, None if unknown or expired"""
+        with self._lock:
+            entry = self._plans.get(plan_id)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    def restore(self, plan_id: str, plan):
+        """Put a taken plan back (commit rejected), with a fresh TTL"""
+        with self._lock:
+            self._plans[plan_id] = (time.monotonic() + self.ttl_seconds, plan)
+
+    def take(self, plan_id: str):
+        """Remove and return a live plan, None if unknown or expired (commit is single use)"""
+        with self._lock:
+            entry = self._plans.pop(plan_id, None)
+        if entry is None:
+            return None
+        expires_at, plan = entry
+        if expires_at < time.monotonic():
+            self._expired(plan)
+            return None
+        return plan
+
+    def reap(self) -> int:
+        now = time.monotonic()
+        with self._lock:
+            expired = [plan_id for plan_id, (expires_at, _) in self._plans.items() if expires_at < now]
+            plans = [self._plans.pop(plan_id)[1] for plan_id in expired]
+        for plan in plans:
+            self._expired(plan)
+        if plans:
+            print(f"🧹 Dropped {len(plans)} expired scheduling plans")
+        return len(plans)
+
+    def _expired(self, plan):
+        if self.on_expire is None:
+            return
+        try:
+            self.on_expire(plan)
+        except Exception as e:
+            print(f"⚠️ Could not clean up expired plan: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {"plans": len(self._plans), "ttl_seconds": self.ttl_seconds}
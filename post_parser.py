@@ -0,0 +1,191 @@
+# post_parser.py
+# Line-based parser for the agency post text files ("post-1 ... post-1 end").
+# One pass over the lines records headers and end markers; posts are cut out afterwards,
+# so the whole file is processed in linear time. Output matches the earlier regex parser.
+
+import bisect
+import os
+import re
+import sys
+
+POST_PARSER_DEBUG = os.getenv("POST_PARSER_DEBUG", "false").lower() == "true"
+
+# Matches: post-1, Post 1, **post-1**, post**-1**, POST_1, etc. (one line)
+POST_START_LINE = re.compile(r'\s*(\*{0,2})\s*post\s*[-_\s]*(\d+)\s*(\*{0,2})\s*', re.IGNORECASE)
+# End formats: post-1 end, Post 1 copy, post_1 done, ...
+POST_END_LINE = re.compile(
+    r'\s*(\*{0,2})\s*post\s*[-_\s]*(\d+)\s*(?:end|copy|copies?|finish|done)\s*\*{0,2}\s*',
+    re.IGNORECASE
+)
+SECTION_START = re.compile(r'AMZ_TELEGRAM', re.IGNORECASE)
+# Supports multiple formats: time: 10:30, Time - 10:30:00, time=9:05 pm
+TIME_LINE = re.compile(
+    r'(?:^|\n)\s*time\s*[:\-=]\s*(\d{1,2}:\d{2}(?::\d{2})?)\s*(?:am|pm)?\s*(?:\n|$)',
+    re.IGNORECASE | re.MULTILINE
+)
+STARS_LINE = re.compile(r'\s*\*{1,2}\s*')
+
+
+def _first_char(line: str, skip: str = "") -> str:
+    """First character that is not whitespace (or in `skip`), "" for none"""
+    for ch in line:
+        if not ch.isspace() and ch not in skip:
+            return ch
+    return ""
+
+
+class PostParser:
+    """
+    feed() text in any chunk sizes, then close() returns {post_num: {category, text, custom_time}}.
+
+    A post runs from its header to the first matching "post N end" line after it; without
+    one, to the next header (or the end of the text). Everything before the first
+    "AMZ_TELEGRAM" marker is ignored when the marker is present.
+    """
+
+    def __init__(self, debug: bool = POST_PARSER_DEBUG):
+        self.debug = debug
+        self._partial = ""
+        self._section_found = False
+        self._reset()
+
+    def _reset(self):
+        self._lines = []
+        self._headers = []        # [line_index, post_num, content_start, boundary]
+        self._ends = {}           # digits -> ([line_index, ...], [boundary, ...])
+        self._skipping = False    # blank lines right after a header belong to the header
+        self._stars_free = False  # header may still absorb one "**" line below it
+
+    # --- scanning ---
+
+    def feed(self, text: str):
+        if not text:
+            return
+        pieces = (self._partial + text).split("\n")
+        self._partial = pieces.pop()
+        for piece in pieces:
+            self._line(piece + "\n")
+
+    def _line(self, line: str):
+        if not self._section_found:
+            section_match = SECTION_START.search(line)
+            if section_match:
+                # Start from "AMZ_TELEGRAM": drop everything before it
+                self._section_found = True
+                self._reset()
+                line = line[section_match.end():]
+                if not line:
+                    return
+
+        index = len(self._lines)
+        self._lines.append(line)
+        body = line[:-1] if line.endswith("\n") else line
+
+        if self._skipping:
+            if not body or body.isspace():
+                self._headers[-1][2] = index + 1
+                return
+            if self._stars_free and STARS_LINE.fullmatch(body):
+                self._stars_free = False
+                self._headers[-1][2] = index + 1
+                return
+            self._skipping = False
+
+        if _first_char(body, "*") not in ("p", "P"):
+            return
+
+        start_match = POST_START_LINE.fullmatch(body)
+        if start_match:
+            boundary = self._boundary(index, bool(start_match.group(1)))
+            self._headers.append([index, int(start_match.group(2)), index + 1, boundary])
+            self._skipping = True
+            self._stars_free = not start_match.group(3)
+            return
+
+        end_match = POST_END_LINE.fullmatch(body)
+        if end_match:
+            indexes, boundaries = self._ends.setdefault(end_match.group(2), ([], []))
+            indexes.append(index)
+            boundaries.append(self._boundary(index, bool(end_match.group(1))))
+
+    def _boundary(self, index: int, has_leading_stars: bool) -> int:
+        """
+        First line of a marker's lead-in: blank lines above it, plus one "**" line when the
+        marker itself has no leading stars. Text above the marker ends before these lines.
+        """
+        k = index - 1
+        while k >= 0 and self._lines[k].isspace():
+            k -= 1
+        if not has_leading_stars and k >= 0 and STARS_LINE.fullmatch(self._lines[k].rstrip("\n")):
+            k -= 1
+            while k >= 0 and self._lines[k].isspace():
+                k -= 1
+        return k + 1
+
+    # --- resolving ---
+
+    def close(self):
+        if self._partial:
+            line, self._partial = self._partial, ""
+            self._line(line)
+
+        posts = {}
+        total_lines = len(self._lines)
+        for i, (_, post_num, content_start, _) in enumerate(self._headers):
+            end_line = total_lines
+            indexes, boundaries = self._ends.get(str(post_num), ((), ()))
+            j = bisect.bisect_left(indexes, content_start)
+            if j < len(indexes):
+                end_line = boundaries[j]
+            elif i + 1 < len(self._headers):
+                # No specific end found: the next post start is the boundary
+                end_line = self._headers[i + 1][3]
+            end_line = max(end_line, content_start)
+
+            posts[post_num] = self._post("".join(self._lines[content_start:end_line]), post_num)
+        return posts
+
+    def _post(self, content: str, post_num: int):
+        category = None
+        custom_time = None
+        text_lines = []
+
+        for line in content.splitlines():
+            stripped = line.strip()
+            # Category check
+            if stripped.lower().startswith("category:"):
+                category = stripped[len("category:"):].strip()
+                continue
+            # Time check
+            if _first_char(line) in ("t", "T"):
+                time_match = TIME_LINE.search(line)
+                if time_match:
+                    custom_time = time_match.group(1)
+                    if self.debug:
+                        print(f"🕐 Found custom time for post {post_num}: {custom_time}")
+                    continue
+            # Keep line exactly (including blank lines)
+            text_lines.append(line)
+
+        clean_text = "\n".join(text_lines).rstrip()
+        if self.debug:
+            print(f"📋 Extracted Post {post_num}: Category='{category}', CustomTime='{custom_time}', TextLength={len(clean_text)}")
+        return {
+            "category": category,
+            "text": clean_text,
+            "custom_time": custom_time
+        }
+
+
+def parse_posts(text: str, debug: bool = POST_PARSER_DEBUG):
+    parser = PostParser(debug=debug)
+    parser.feed(text)
+    return parser.close()
+
+
+if __name__ == "__main__":
+    # Parse-only debug run: python post_parser.py posts.txt [...]
+    for path in sys.argv[1:]:
+        with open(path, encoding="utf-8", errors="ignore") as f:
+            result = parse_posts(f.read(), debug=True)
+        print(f"✅ {path}: {len(result)} posts")
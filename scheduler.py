@@ -1,27 +1,83 @@
-
 ### ✅ scheduler.py
 # Simply forwards args to telegram_utils.send_telegram_message
+# Jobs are kept in a SQLite job store so a worker restart does not lose them.
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from apscheduler.triggers.date import DateTrigger
 from datetime import datetime
 import os
-from telegram_utils import send_telegram_message
+from media_store import store_file, sweep
+from app_state import STATE_DIR
+
+JOBS_DB_PATH = os.path.join(STATE_DIR, "jobs.sqlite")
+
+# Jobs whose run time passed while the worker was down still fire on startup if they are
+# at most this late; older ones are skipped (and logged by APScheduler)
+SCHEDULER_MISFIRE_GRACE_SECONDS = int(os.getenv("SCHEDULER_MISFIRE_GRACE_SECONDS", "3600"))
+# Several missed runs of the same job fire once
+SCHEDULER_COALESCE = os.getenv("SCHEDULER_COALESCE", "true").lower() == "true"
+
+os.makedirs(STATE_DIR, exist_ok=True)
+
+scheduler = AsyncIOScheduler(
+    jobstores={"default": SQLAlchemyJobStore(url=f"sqlite:///{JOBS_DB_PATH}")},
+    job_defaults={
+        "misfire_grace_time": SCHEDULER_MISFIRE_GRACE_SECONDS,
+        "coalesce": SCHEDULER_COALESCE,
+    },
+)
 
-scheduler = AsyncIOScheduler()
-scheduler.start()
 
-def schedule_message(image_path: str | None, text: str | None, time_str: str, post_number: int, category: str | None = None ):
+async def run_scheduled_post(image_path, text, post_number, category, run_time, channel_username=None, channel_id=None):
+    """Job entry point; imported lazily so loading the job store does not start Telegram"""
+    from telegram_utils import send_telegram_message
+    if image_path and not os.path.exists(image_path):
+        print(f"⚠️ Media for post {post_number} is gone ({image_path}), sending text only")
+        image_path = None
+    await send_telegram_message(image_path, text, post_number, category, run_time, channel_username, channel_id)
+
+
+def open_job_store():
+    """
+    Adding jobs before the scheduler starts only queues them in memory. Processes that
+    only enqueue (the API) open the store paused; the worker runs the jobs.
+    Must be called from the event loop (AsyncIOScheduler binds to the running loop).
+    """
+    if not scheduler.running:
+        scheduler.start(paused=True)
+
+
+def schedule_message(image_path: str | None, text: str | None, time_str: str, post_number: int, category: str | None = None,
+                     channel_username: str | None = None, channel_id: str | None = None):
+    """
+    Enqueue a post in the shared job store. Safe from any process: the worker picks the
+    job up within SCHEDULER_POLL_SECONDS and sends it at run_time.
+    """
     run_time = datetime.fromisoformat(time_str) if isinstance(time_str, str) else time_str
+    # uploads/ is wiped by the next request; the job keeps its own copy of the media
+    media_path = store_file(image_path) if image_path and os.path.exists(image_path) else None
+    open_job_store()
     scheduler.add_job(
-    send_telegram_message,
+    run_scheduled_post,
     trigger=DateTrigger(run_date=run_time),
     args=[
-        image_path,
+        media_path,
         text,
         post_number,
         category,
-        run_time
+        run_time,
+        channel_username,
+        channel_id
     ],
-    id=f"post_{post_number}_{run_time.timestamp()}"
+    id=f"post_{post_number}_{run_time.timestamp()}",
+    replace_existing=True
 )
 
+
+def sweep_job_media(min_age_seconds: int = 24 * 3600) -> int:
+    """Remove stored media no pending job refers to"""
+    referenced = [job.args[0] for job in scheduler.get_jobs() if job.args]
+    removed = sweep(referenced, min_age_seconds)
+    if removed:
+        print(f"🧹 Removed {removed} media files no longer used by scheduled jobs")
+    return removed
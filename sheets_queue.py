@@ -0,0 +1,145 @@
+# sheets_queue.py
+# Write-behind queue for Google Sheets status rows.
+# Senders enqueue rows and return immediately; a background thread appends them
+# with one append_rows call per worksheet per flush interval.
+
+import atexit
+import os
+import threading
+from collections import OrderedDict
+
+SHEETS_FLUSH_INTERVAL_SECONDS = float(os.getenv("SHEETS_FLUSH_INTERVAL_SECONDS", "5"))
+SHEETS_QUEUE_MAX_ROWS = int(os.getenv("SHEETS_QUEUE_MAX_ROWS", "5000"))
+SHEETS_FLUSH_MAX_ATTEMPTS = 3
+
+
+class SheetsWriteBehindQueue:
+    """
+    Buffers rows per worksheet title.
+
+    flush_rows(sheet_name, rows) -> bool does the actual append.
+    on_drop(sheet_name, rows) receives rows that could not be written
+    (queue overflow or repeated flush failures) so they can go to the local log.
+    """
+
+    def __init__(self, flush_rows, on_drop, flush_interval=SHEETS_FLUSH_INTERVAL_SECONDS, max_rows=SHEETS_QUEUE_MAX_ROWS):
+        self._flush_rows = flush_rows
+        self._on_drop = on_drop
+        self.flush_interval = flush_interval
+        self.max_rows = max_rows
+        self._pending = OrderedDict()  # sheet_name -> list of rows
+        self._attempts = {}            # sheet_name -> consecutive failed flushes
+        self._size = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self.flushed_rows = 0
+        self.dropped_rows = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="sheets-write-behind", daemon=True)
+            self._thread.start()
+
+    def enqueue(self, sheet_name: str, row: list):
+        overflow = []
+        with self._lock:
+            self._pending.setdefault(sheet_name, []).append(row)
+            self._size += 1
+            # Bounded memory: hand the oldest rows to the local log instead of growing forever
+            while self._size > self.max_rows:
+                oldest_sheet = next(iter(self._pending))
+                rows = self._pending[oldest_sheet]
+                overflow.append((oldest_sheet, rows.pop(0)))
+                self._size -= 1
+                if not rows:
+                    del self._pending[oldest_sheet]
+        if self._thread is None or not self._thread.is_alive():
+            self.start()
+        for sheet_name, row in overflow:
+            self._drop(sheet_name, [row])
+
+    def pending(self) -> int:
+        return self._size
+
+    def _drop(self, sheet_name: str, rows: list):
+        self.dropped_rows += len(rows)
+        try:
+            self._on_drop(sheet_name, rows)
+        except Exception as e:
+            print(f"❌ Could not hand {len(rows)} unsent rows for {sheet_name} to fallback: {e}")
+
+    def flush(self):
+        """Write everything pending now (one append_rows per worksheet)"""
+        with self._flush_lock:
+            with self._lock:
+                batches = list(self._pending.items())
+                self._pending = OrderedDict()
+                self._size = 0
+
+            for sheet_name, rows in batches:
+                try:
+                    ok = self._flush_rows(sheet_name, rows)
+                except Exception as e:
+                    print(f"❌ Sheets flush error for {sheet_name}: {e}")
+                    ok = False
+
+                if ok:
+                    self.flushed_rows += len(rows)
+                    self._attempts.pop(sheet_name, None)
+                    continue
+
+                attempts = self._attempts.get(sheet_name, 0) + 1
+                if attempts >= SHEETS_FLUSH_MAX_ATTEMPTS:
+                    print(f"❌ Giving up on {len(rows)} rows for {sheet_name} after {attempts} flushes")
+                    self._attempts.pop(sheet_name, None)
+                    self._drop(sheet_name, rows)
+                    continue
+
+                # Put the rows back in front of anything queued meanwhile; retried next interval
+                self._attempts[sheet_name] = attempts
+                with self._lock:
+                    self._pending[sheet_name] = rows + self._pending.get(sheet_name, [])
+                    self._pending.move_to_end(sheet_name, last=False)
+                    self._size += len(rows)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            if self._size:
+                self.flush()
+
+    def stop(self):
+        """Stop the background thread and flush what is left (app shutdown)"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 30)
+            self._thread = None
+        if self._size:
+            self.flush()
+        # Anything still pending after the final flush would be lost on exit
+        with self._lock:
+            leftovers = list(self._pending.items())
+            self._pending = OrderedDict()
+            self._size = 0
+        for sheet_name, rows in leftovers:
+            self._drop(sheet_name, rows)
+
+    def stats(self):
+        return {
+            "pending_rows": self._size,
+            "flushed_rows": self.flushed_rows,
+            "dropped_rows": self.dropped_rows,
+            "flush_interval_seconds": self.flush_interval,
+            "max_rows": self.max_rows,
+        }
+
+    def register_atexit(self):
+        atexit.register(self.stop)
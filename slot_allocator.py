@@ -0,0 +1,113 @@
+# slot_allocator.py
+# Scheduling window as integer 5-minute slot offsets from its start.
+# Placement (pinned times, fixed interval, even spread) works on plain ints and a
+# bitmap of taken slots, so windows of several days or weeks cost O(n log n).
+
+import bisect
+from datetime import datetime, timedelta
+
+SLOT_MINUTES = 5
+SLOT = timedelta(minutes=SLOT_MINUTES)
+
+
+def round_to_nearest_5(dt: datetime) -> datetime:
+    """
+    Rounds time to the nearest 5-minute mark.
+    Examples:
+        10:27 → 10:25
+        10:28 → 10:30
+    """
+    minute = dt.minute
+    remainder = minute % 5
+    if remainder < 3:
+        minute -= remainder
+    else:
+        minute += (5 - remainder)
+    if minute == 60:
+        dt = dt.replace(minute=0) + timedelta(hours=1)
+    else:
+        dt = dt.replace(minute=minute)
+    return dt.replace(second=0, microsecond=0)
+
+
+class SlotGrid:
+    """Slots 0..count-1 for the 5-minute marks from start to end (both rounded, inclusive)"""
+
+    def __init__(self, start: datetime, end: datetime):
+        self.start = round_to_nearest_5(start)
+        self.end = round_to_nearest_5(end)
+        self.count = max(0, (self.end - self.start) // SLOT + 1)
+
+    def slot_of(self, dt: datetime) -> int:
+        """Slot for dt (may be outside 0..count-1)"""
+        return (round_to_nearest_5(dt) - self.start) // SLOT
+
+    def time_of(self, slot: int) -> datetime:
+        return self.start + slot * SLOT
+
+    def contains(self, slot: int) -> bool:
+        return 0 <= slot < self.count
+
+
+def allocate(post_nums, grid: SlotGrid, blocked, pinned=None, interval_minutes: int = 0):
+    """
+    Assign a slot to every post in post_nums (in order).
+
+    blocked: set of slots that must not be used.
+    pinned: {post_num: slot} requested explicitly; a pinned post on a blocked slot gets None
+            and is not placed elsewhere.
+    interval_minutes > 0: each next post goes to the first free slot at least
+            interval_minutes after the previous target; otherwise posts are spread
+            evenly over the free slots.
+
+    Returns ({post_num: slot or None}, set of assigned slots).
+    """
+    post_times = {}
+    assigned = set()
+
+    for post_num, slot in (pinned or {}).items():
+        if slot in blocked:
+            post_times[post_num] = None
+            continue
+        post_times[post_num] = slot
+        assigned.add(slot)
+
+    taken = bytearray(grid.count)
+    for slot in blocked:
+        if grid.contains(slot):
+            taken[slot] = 1
+    for slot in assigned:
+        if grid.contains(slot):
+            taken[slot] = 1
+    free = [slot for slot in range(grid.count) if not taken[slot]]
+
+    unassigned = [num for num in post_nums if num not in post_times]
+
+    if interval_minutes > 0:
+        # Targets only move forward, so one pointer over the free slots is enough
+        index = 0
+        for i, post_num in enumerate(unassigned):
+            target = -(-i * interval_minutes // SLOT_MINUTES)  # first slot at or after start + i * interval
+            index = max(index, bisect.bisect_left(free, target))
+            if index < len(free):
+                post_times[post_num] = free[index]
+                assigned.add(free[index])
+                index += 1
+            else:
+                post_times[post_num] = None
+    elif len(unassigned) <= len(free):
+        step = max(1, len(free) // len(unassigned)) if len(unassigned) > 1 else 0
+        for i, post_num in enumerate(unassigned):
+            slot = free[min(i * step, len(free) - 1)]
+            post_times[post_num] = slot
+            assigned.add(slot)
+    else:
+        # More posts than free slots: fill what we can
+        for i, post_num in enumerate(unassigned):
+            if i < len(free):
+                post_times[post_num] = free[i]
+                assigned.add(free[i])
+            else:
+                post_times[post_num] = None
+
+    return post_times, assigned
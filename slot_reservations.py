@@ -0,0 +1,120 @@
+# slot_reservations.py
+# Per-channel slot reservations shared by concurrent scheduling requests.
+# Planning and claiming happen in one critical section, so two requests can never pick
+# the same free slot for the same channel. Backed by SQLite: in memory by default, or a
+# file (SLOT_RESERVATIONS_DB) to share reservations between processes.
+
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+SLOT_RESERVATIONS_DB = os.getenv("SLOT_RESERVATIONS_DB", ":memory:")
+# Planned-but-unsent reservations are dropped after this long (request crashed or hung)
+SLOT_HOLD_SECONDS = int(os.getenv("SLOT_HOLD_SECONDS", "1800"))
+# Sent posts keep their slot this long past the slot time, covering the Sheets write-behind lag
+SLOT_CONFIRMED_GRACE_SECONDS = int(os.getenv("SLOT_CONFIRMED_GRACE_SECONDS", "3600"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reservations (
+    channel TEXT NOT NULL,
+    slot INTEGER NOT NULL,
+    token TEXT NOT NULL,
+    status TEXT NOT NULL,
+    expires_at INTEGER NOT NULL,
+    PRIMARY KEY (channel, slot)
+);
+CREATE INDEX IF NOT EXISTS idx_reservations_token ON reservations (token);
+"""
+
+
+def _ts(dt: datetime) -> int:
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+class SlotReservations:
+    def __init__(self, path: str = SLOT_RESERVATIONS_DB):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _transaction(self):
+        # Thread lock for this process, IMMEDIATE for other processes sharing the file
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _purge(db):
+        db.execute("DELETE FROM reservations WHERE expires_at < ?", (int(time.time()),))
+
+    def plan(self, channel_ids, start: datetime, end: datetime, planner):
+        """
+        Run planner(reserved) with the datetimes already reserved for any of channel_ids
+        between start and end. planner returns (result, datetimes_to_claim); those are
+        claimed for every channel before any other request can plan.
+        Returns (result, reserved, token).
+        """
+        token = uuid.uuid4().hex
+        tz = start.tzinfo
+        with self._transaction() as db:
+            self._purge(db)
+            placeholders = ",".join("?" * len(channel_ids))
+            rows = db.execute(
+                f"SELECT DISTINCT slot FROM reservations WHERE channel IN ({placeholders}) AND slot BETWEEN ? AND ?",
+                (*channel_ids, _ts(start), _ts(end))
+            ).fetchall() if channel_ids else []
+            reserved = {datetime.fromtimestamp(slot, tz=tz or timezone.utc) for (slot,) in rows}
+
+            result, to_claim = planner(reserved)
+            to_claim = {_ts(dt) for dt in to_claim if dt is not None}
+            expires_at = int(time.time()) + SLOT_HOLD_SECONDS
+            db.executemany(
+                "INSERT INTO reservations (channel, slot, token, status, expires_at) VALUES (?, ?, ?, 'held', ?)",
+                [(channel_id, slot, token, expires_at) for channel_id in channel_ids for slot in to_claim]
+            )
+        return result, reserved, token
+
+    def confirm(self, channel_id, slot: datetime, token: str):
+        """The post was sent: keep the slot until it has passed"""
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE reservations SET status = 'confirmed', expires_at = ? WHERE channel = ? AND slot = ? AND token = ?",
+                (_ts(slot) + SLOT_CONFIRMED_GRACE_SECONDS, channel_id, _ts(slot), token)
+            )
+
+    def release(self, channel_id, slot: datetime, token: str):
+        """The send failed or was skipped: free the slot for other requests"""
+        with self._transaction() as db:
+            db.execute(
+                "DELETE FROM reservations WHERE channel = ? AND slot = ? AND token = ?",
+                (channel_id, _ts(slot), token)
+            )
+
+    def release_unconfirmed(self, token: str):
+        """End of a request: free whatever it planned but did not send"""
+        with self._transaction() as db:
+            db.execute("DELETE FROM reservations WHERE token = ? AND status = 'held'", (token,))
+
+    def stats(self):
+        with self._transaction() as db:
+            self._purge(db)
+            rows = db.execute("SELECT status, COUNT(*) FROM reservations GROUP BY status").fetchall()
+        return {"db": self.path, **{status: count for status, count in rows}}
+
+
+slot_reservations = SlotReservations()
@@ -0,0 +1,224 @@
+# status_journal.py
+# Append-only local status log (JSON lines). Appends are O(1) and file-locked so several
+# processes can write; post_logs.xlsx is exported from it in the background for humans,
+# and rows can be replayed into Google Sheets once it is reachable again.
+
+import atexit
+import json
+import os
+import shutil
+import threading
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: in-process locking only
+    fcntl = None
+
+LOGS_DIR = "logs"
+STATUS_JOURNAL_PATH = os.getenv("STATUS_JOURNAL_PATH", os.path.join(LOGS_DIR, "post_logs.jsonl"))
+STATUS_EXPORT_PATH = os.path.join(LOGS_DIR, "post_logs.xlsx")
+# Appends within this window are exported to Excel together
+STATUS_EXPORT_DELAY_SECONDS = float(os.getenv("STATUS_EXPORT_DELAY_SECONDS", "30"))
+
+COLUMNS = ["Post Number", "Category", "Date", "Time", "Status", "Message", "Channel"]
+# Row key holding the worksheet a row belongs to (not exported)
+SHEET_KEY = "_sheet"
+
+
+class _FileLock:
+    def __init__(self, f, exclusive=True):
+        self.f = f
+        self.mode = (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) if fcntl else None
+
+    def __enter__(self):
+        if fcntl:
+            fcntl.flock(self.f.fileno(), self.mode)
+        return self.f
+
+    def __exit__(self, *exc):
+        if fcntl:
+            fcntl.flock(self.f.fileno(), fcntl.LOCK_UN)
+
+
+class StatusJournal:
+    def __init__(self, path=STATUS_JOURNAL_PATH, export_path=STATUS_EXPORT_PATH, export_delay=STATUS_EXPORT_DELAY_SECONDS):
+        self.path = path
+        self.offset_path = f"{path}.replayed"
+        self.export_path = export_path
+        self.export_delay = export_delay
+        self._lock = threading.Lock()
+        self._export_timer = None
+        self._replay_lock = threading.Lock()
+        self._export_lock = threading.Lock()
+        self._exported_size = None
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.seed_from_excel()
+
+    # --- writing ---
+
+    def append(self, rows):
+        rows = list(rows)
+        if not rows:
+            return
+        data = "".join(json.dumps(row, ensure_ascii=False, default=str) + "\n" for row in rows).encode("utf-8")
+        with self._lock, open(self.path, "ab") as f, _FileLock(f):
+            f.write(data)
+            f.flush()
+        self._schedule_export()
+
+    def seed_from_excel(self):
+        """
+        First run: carry rows from an existing post_logs.xlsx into the journal (they count as
+        replayed). Every source column is kept; if the sheet does not have the expected
+        columns, the original is copied aside before the first export rewrites it.
+        """
+        if os.path.exists(self.path) or not os.path.exists(self.export_path):
+            return
+        try:
+            df = pd.read_excel(self.export_path).fillna("")
+        except Exception as e:
+            print(f"⚠️ Could not seed status journal from {self.export_path}: {e}")
+            return
+        source_columns = [str(col) for col in df.columns]
+        if source_columns != COLUMNS:
+            root, ext = os.path.splitext(self.export_path)
+            backup_path = f"{root}.orig{ext}"
+            if not os.path.exists(backup_path):
+                shutil.copy2(self.export_path, backup_path)
+            missing = [col for col in COLUMNS if col not in source_columns]
+            extra = [col for col in source_columns if col not in COLUMNS]
+            print(f"⚠️ {self.export_path} does not have the expected columns (missing {missing}, "
+                  f"{len(extra)} extra); all columns kept, original saved as {backup_path}")
+        rows = [{**{col: "" for col in COLUMNS}, **{str(col): value for col, value in row.items()}}
+                for row in df.to_dict(orient="records")]
+        data = "".join(json.dumps(row, ensure_ascii=False, default=str) + "\n" for row in rows).encode("utf-8")
+        with self._lock, open(self.path, "ab") as f, _FileLock(f):
+            if f.tell() == 0:
+                f.write(data)
+                f.flush()
+                self._write_offset(f.tell())
+                print(f"📁 Seeded status journal with {len(rows)} rows from {self.export_path}")
+
+    # --- reading ---
+
+    def read(self, offset=0):
+        """(next_offset, row) for every complete line from byte `offset` on"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f, _FileLock(f, exclusive=False):
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # a writer in another process is mid-append
+                offset += len(line)
+                try:
+                    yield offset, json.loads(line)
+                except ValueError:
+                    print(f"⚠️ Skipping unreadable status journal line at byte {offset - len(line)}")
+
+    def rows(self):
+        return [row for _, row in self.read()]
+
+    # --- Excel export ---
+
+    def _schedule_export(self):
+        with self._lock:
+            if self._export_timer is not None:
+                return
+            self._export_timer = threading.Timer(self.export_delay, self.export)
+            self._export_timer.daemon = True
+            self._export_timer.start()
+
+    def export(self):
+        """Rewrite post_logs.xlsx from the journal (background; skipped when nothing changed)"""
+        with self._lock:
+            self._export_timer = None
+        with self._export_lock:
+            try:
+                size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+                if size == self._exported_size:
+                    return
+                rows = self.rows()
+                # Known columns first, then any extra ones carried over from the seeded sheet
+                columns = list(COLUMNS)
+                for row in rows:
+                    columns.extend(col for col in row if col not in columns and col != SHEET_KEY)
+                df = pd.DataFrame(rows, columns=columns)
+                tmp_path = f"{self.export_path}.{os.getpid()}.tmp.xlsx"
+                df.to_excel(tmp_path, index=False)
+                os.replace(tmp_path, self.export_path)
+                self._exported_size = size
+                print(f"📁 Exported {len(df)} status rows to {self.export_path}")
+            except Exception as e:
+                print(f"❌ Status log export failed: {e}")
+
+    def stop(self):
+        with self._lock:
+            timer, self._export_timer = self._export_timer, None
+        if timer is not None:
+            timer.cancel()
+            self.export()
+
+    # --- replay into Google Sheets ---
+
+    def _read_offset(self):
+        try:
+            with open(self.offset_path) as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _write_offset(self, offset):
+        tmp_path = f"{self.offset_path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(str(offset))
+        os.replace(tmp_path, self.offset_path)
+
+    def replay(self, write_rows, to_sheet_row):
+        """
+        Send rows appended since the last replay to Sheets, in order, one write per run of
+        rows for the same worksheet. write_rows(sheet_name, rows) -> bool; stops at the first
+        failure so the rest is retried next time. Returns the number of rows replayed.
+        """
+        with self._replay_lock:
+            offset = self._read_offset()
+            # Read first: the journal stays unlocked for appends while Sheets is called
+            pending = list(self.read(offset))
+
+            # Runs of consecutive rows for the same worksheet: [sheet_name, rows, end_offset]
+            runs = []
+            for next_offset, row in pending:
+                sheet_name = row.get(SHEET_KEY)
+                if not sheet_name:
+                    if runs:
+                        runs[-1][2] = next_offset
+                    else:
+                        offset = next_offset
+                    continue
+                if runs and runs[-1][0] == sheet_name:
+                    runs[-1][1].append(to_sheet_row(row))
+                    runs[-1][2] = next_offset
+                else:
+                    runs.append([sheet_name, [to_sheet_row(row)], next_offset])
+
+            replayed = 0
+            for sheet_name, rows, end_offset in runs:
+                try:
+                    ok = write_rows(sheet_name, rows)
+                except Exception as e:
+                    print(f"❌ Replaying status rows to {sheet_name} failed: {e}")
+                    ok = False
+                if not ok:
+                    break
+                offset = end_offset
+                replayed += len(rows)
+
+            if pending:
+                self._write_offset(offset)
+            if replayed:
+                print(f"✅ Replayed {replayed} local status rows to Google Sheets")
+            return replayed
+
+    def register_atexit(self):
+        atexit.register(self.stop)
@@ -0,0 +1,136 @@
+# telegram_client.py
+# One long-lived Telethon connection shared by every endpoint and by the sender.
+
+import asyncio
+import os
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from telethon import TelegramClient
+from telethon.sessions import StringSession
+from telethon.errors import FloodWaitError
+from telegram_limiter import telegram_limiter
+
+load_dotenv()
+
+# --- Telegram Credentials ---
+api_id = int(os.getenv("TELEGRAM_API_ID"))
+api_hash = os.getenv("TELEGRAM_API_HASH")
+phone = os.getenv("TELEGRAM_PHONE_NUMBER")
+session_string = os.getenv("TELETHON_SESSION")
+
+HEALTH_CHECK_INTERVAL_SECONDS = int(os.getenv("TELEGRAM_HEALTH_CHECK_SECONDS", "60"))
+# Telethon sleeps through short flood waits on its own, stalling every caller; 0 hands
+# them all to telegram_limiter, which pauses only the affected lane
+FLOOD_SLEEP_THRESHOLD = int(os.getenv("TELEGRAM_FLOOD_SLEEP_THRESHOLD", "0"))
+
+
+class TelegramConnectionManager:
+    """
+    Owns the shared TelegramClient.
+
+    `start()`/`stop()` are driven by the FastAPI lifespan. `get_client()` always
+    returns a connected, authorized client and reconnects on demand, so callers
+    outside the app (scheduler worker) can use it without calling `start()`.
+    """
+
+    def __init__(self, session: str, api_id: int, api_hash: str):
+        self._session = session
+        self._api_id = api_id
+        self._api_hash = api_hash
+        self._lock = asyncio.Lock()
+        self._health_task = None
+        self.client = None
+        self.connected_at = None
+        self.last_check = None
+        self.last_error = None
+        self.reconnects = 0
+
+    def _build_client(self):
+        return TelegramClient(
+            StringSession(self._session), self._api_id, self._api_hash,
+            flood_sleep_threshold=FLOOD_SLEEP_THRESHOLD
+        )
+
+    async def get_client(self) -> TelegramClient:
+        """Return the shared client, connecting it first if needed"""
+        async with self._lock:
+            if self.client is None:
+                self.client = self._build_client()
+            if not self.client.is_connected():
+                await self.client.connect()
+                if not await self.client.is_user_authorized():
+                    raise Exception("Telegram client not authorized")
+                self.connected_at = datetime.now(timezone.utc)
+                print("🔌 Telegram client connected")
+            return self.client
+
+    async def reconnect(self):
+        """Drop the current connection and open a fresh one"""
+        async with self._lock:
+            if self.client is not None and self.client.is_connected():
+                try:
+                    await self.client.disconnect()
+                except Exception as e:
+                    print(f"⚠️ Error while disconnecting Telegram client: {e}")
+        self.reconnects += 1
+        print("🔄 Reconnecting Telegram client...")
+        return await self.get_client()
+
+    async def check_health(self):
+        """Round-trip to Telegram; reconnect once if the connection is dead"""
+        self.last_check = datetime.now(timezone.utc)
+        try:
+            client = await self.get_client()
+            await telegram_limiter.call("resolve", client.get_me)
+            self.last_error = None
+        except FloodWaitError as e:
+            # Telegram answered, so the connection is alive; reconnecting would only drop in-flight calls
+            print(f"⏳ Telegram health check throttled ({e.seconds}s flood wait), connection kept")
+        except Exception as e:
+            print(f"⚠️ Telegram health check failed: {e}")
+            self.last_error = str(e)
+            try:
+                client = await self.reconnect()
+                await telegram_limiter.call("resolve", client.get_me)
+                self.last_error = None
+            except Exception as retry_error:
+                print(f"❌ Telegram reconnect failed: {retry_error}")
+                self.last_error = str(retry_error)
+        return self.status()
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(HEALTH_CHECK_INTERVAL_SECONDS)
+            await self.check_health()
+
+    async def start(self):
+        """Connect and start the background health checks (FastAPI startup)"""
+        if self._health_task is None:
+            self._health_task = asyncio.create_task(self._health_loop())
+        await self.get_client()
+
+    async def stop(self):
+        """Stop health checks and disconnect (FastAPI shutdown)"""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+        if self.client is not None and self.client.is_connected():
+            await self.client.disconnect()
+            print("🔌 Telegram client disconnected")
+
+    def status(self):
+        return {
+            "connected": bool(self.client and self.client.is_connected()),
+            "healthy": self.last_error is None,
+            "connected_at": self.connected_at.isoformat() if self.connected_at else None,
+            "last_check": self.last_check.isoformat() if self.last_check else None,
+            "last_error": self.last_error,
+            "reconnects": self.reconnects,
+        }
+
+
+client_manager = TelegramConnectionManager(session_string, api_id, api_hash)
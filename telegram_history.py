@@ -0,0 +1,144 @@
+# telegram_history.py
+# Channel history helpers that avoid walking message history where Telegram can answer directly.
+
+from datetime import timezone
+from telethon.tl.functions.messages import GetHistoryRequest, GetScheduledHistoryRequest
+from telethon.tl.types.messages import MessagesNotModified
+from telegram_limiter import telegram_limiter
+from app_state import channel_key
+
+COUNT_MODES = ("index", "offset", "scan")
+
+
+def _as_utc(dt):
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+async def history_position(client, peer, offset_date):
+    """
+    Number of messages sent at or after `offset_date`.
+
+    One GetHistoryRequest with limit=1: Telegram returns the newest message
+    older than offset_date together with its absolute position (offset_id_offset)
+    counted from the newest message. Returns None if the server omits it.
+    """
+    result = await telegram_limiter.call("history", client, GetHistoryRequest(
+        peer=peer,
+        offset_id=0,
+        offset_date=offset_date,
+        add_offset=0,
+        limit=1,
+        max_id=0,
+        min_id=0,
+        hash=0
+    ))
+    total = getattr(result, 'count', None)
+    if total is None:
+        total = len(result.messages)
+    if not result.messages:
+        # Nothing older than offset_date: every message is newer
+        return total
+    return getattr(result, 'offset_id_offset', None)
+
+
+async def count_messages_between(client, peer, start, end):
+    """Messages with start <= date < end in two API calls, or None if Telegram gave no positions"""
+    newer_than_end = await history_position(client, peer, _as_utc(end))
+    newer_than_start = await history_position(client, peer, _as_utc(start))
+    if newer_than_end is None or newer_than_start is None:
+        return None
+    return max(0, newer_than_start - newer_than_end)
+
+
+async def scan_count_messages(client, peer, start, end):
+    """Count start <= date < end by iterating history backwards from `end`"""
+    start, end = _as_utc(start), _as_utc(end)
+    count = 0
+    async for message in telegram_limiter.iter_messages(client, peer, offset_date=end):
+        msg_date = _as_utc(message.date)
+        if msg_date < start:
+            break
+        if msg_date < end:
+            count += 1
+    return count
+
+
+async def count_live_posts(client, peer, start, end, count_mode="offset"):
+    """Live message count for start <= date < end; offset arithmetic with a scan fallback"""
+    if count_mode == "offset":
+        count = await count_messages_between(client, peer, start, end)
+        if count is not None:
+            return count
+        print("⚠️ Telegram returned no history offsets, falling back to scan")
+    return await scan_count_messages(client, peer, start, end)
+
+
+def telegram_vector_hash(numbers):
+    """Telegram's 64-bit hash over a list of integers (see core.telegram.org/api/offsets#hash-generation)"""
+    mask = (1 << 64) - 1
+    h = 0
+    for n in numbers:
+        h ^= h >> 21
+        h = (h ^ (h << 35)) & mask
+        h ^= h >> 4
+        h = (h + (n & mask)) & mask
+    # The request field is a signed long
+    return h - (1 << 64) if h >= (1 << 63) else h
+
+
+def scheduled_history_hash(messages):
+    """Hash Telegram computes for a scheduled list: id, edit_date (or 0), date per message"""
+    numbers = []
+    for msg in messages:
+        edit_date = getattr(msg, 'edit_date', None)
+        numbers.append(msg.id)
+        numbers.append(int(edit_date.timestamp()) if edit_date else 0)
+        numbers.append(int(msg.date.timestamp()) if msg.date else 0)
+    return telegram_vector_hash(numbers)
+
+
+class ScheduledHistoryCache:
+    """
+    Last scheduled-message list per channel. The list's hash is sent with the
+    next GetScheduledHistoryRequest and the cached list is reused when Telegram
+    answers messages.messagesNotModified.
+    """
+
+    def __init__(self):
+        self._entries = {}  # channel -> (hash, messages)
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, client, channel: str, peer):
+        key = channel_key(channel)
+        cached_hash, cached_messages = self._entries.get(key, (0, None))
+        result = await telegram_limiter.call("history", client, GetScheduledHistoryRequest(peer=peer, hash=cached_hash))
+
+        if isinstance(result, MessagesNotModified) and cached_messages is not None:
+            self.hits += 1
+            return cached_messages
+
+        self.misses += 1
+        messages = list(getattr(result, 'messages', []) or [])
+        self._entries[key] = (scheduled_history_hash(messages), messages)
+        return messages
+
+    def invalidate(self, channel: str = None):
+        if channel is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(channel_key(channel), None)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "channels": len(self._entries),
+            "not_modified": self.hits,
+            "full_fetches": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+scheduled_history = ScheduledHistoryCache()
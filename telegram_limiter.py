@@ -0,0 +1,174 @@
+# telegram_limiter.py
+# Token-bucket rate limiting and flood-wait handling for every Telegram call.
+# Calls are grouped in lanes (send, upload, resolve, history), each with its own budget.
+# A FloodWaitError pauses only the lane it happened in, and the call is retried after
+# the wait, so throttling slows a batch down instead of failing the posts that follow.
+
+import asyncio
+import os
+import time
+from telethon.errors import FloodWaitError
+
+# Longest flood wait we sit out; anything longer is raised to the caller
+TELEGRAM_FLOOD_WAIT_MAX_SECONDS = int(os.getenv("TELEGRAM_FLOOD_WAIT_MAX_SECONDS", "300"))
+TELEGRAM_FLOOD_RETRIES = int(os.getenv("TELEGRAM_FLOOD_RETRIES", "3"))
+# iter_messages fetches history 100 messages per request
+HISTORY_PAGE_SIZE = 100
+
+# lane -> (requests per second, burst)
+DEFAULT_LANES = {
+    "send": (1.0, 5),
+    "upload": (0.5, 3),
+    "resolve": (0.2, 3),
+    "history": (2.0, 10),
+}
+
+
+class LanePausedError(FloodWaitError):
+    """Raised without calling Telegram: the lane is paused for longer than we are willing to wait"""
+
+
+def _lane_config(name: str, rate: float, burst: int):
+    """TELEGRAM_<LANE>_RATE / TELEGRAM_<LANE>_BURST override the defaults"""
+    prefix = f"TELEGRAM_{name.upper()}"
+    return float(os.getenv(f"{prefix}_RATE", str(rate))), int(os.getenv(f"{prefix}_BURST", str(burst)))
+
+
+class Lane:
+    def __init__(self, name: str, rate: float, burst: int):
+        self.name = name
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+        # Metrics
+        self.calls = 0
+        self.throttled = 0
+        self.throttle_seconds = 0.0
+        self.flood_waits = 0
+        self.flood_wait_seconds = 0.0
+        self.retries = 0
+        self.failures = 0
+
+    async def acquire(self):
+        """Wait for a token, and for any flood-wait pause on this lane to end"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                remaining = self.paused_until - now
+                if remaining > TELEGRAM_FLOOD_WAIT_MAX_SECONDS:
+                    # Fail fast instead of holding the lane (and everyone queued on it) for hours
+                    self.failures += 1
+                    raise LanePausedError(request=None, capture=int(remaining) + 1)
+                if remaining > 0:
+                    await asyncio.sleep(remaining)
+                    continue
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    self.calls += 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+                self.throttled += 1
+                self.throttle_seconds += delay
+                await asyncio.sleep(delay)
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+        self.flood_waits += 1
+        self.flood_wait_seconds += seconds
+
+    def stats(self):
+        return {
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "calls": self.calls,
+            "throttled": self.throttled,
+            "throttle_seconds": round(self.throttle_seconds, 2),
+            "flood_waits": self.flood_waits,
+            "flood_wait_seconds": round(self.flood_wait_seconds, 2),
+            "retries": self.retries,
+            "failures": self.failures,
+            "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 2),
+        }
+
+
+class TelegramRateLimiter:
+    def __init__(self, lanes=DEFAULT_LANES):
+        self.lanes = {name: Lane(name, *_lane_config(name, rate, burst)) for name, (rate, burst) in lanes.items()}
+
+    def _flood_wait(self, lane: Lane, error: FloodWaitError, attempt: int):
+        """Pause the lane for a flood wait, or re-raise if it is too long or retries are used up"""
+        seconds = getattr(error, "seconds", 0) or 0
+        if seconds > TELEGRAM_FLOOD_WAIT_MAX_SECONDS or attempt >= TELEGRAM_FLOOD_RETRIES:
+            lane.failures += 1
+            lane.pause(seconds)
+            raise error
+        # One extra second: Telegram rounds the wait down
+        lane.pause(seconds + 1)
+        lane.retries += 1
+        print(f"⏳ Telegram flood wait on '{lane.name}': pausing {seconds + 1}s (retry {attempt + 1}/{TELEGRAM_FLOOD_RETRIES})")
+
+    async def call(self, lane_name: str, fn, *args, **kwargs):
+        """await fn(*args, **kwargs) within the lane's budget, retrying after flood waits"""
+        lane = self.lanes[lane_name]
+        attempt = 0
+        while True:
+            await lane.acquire()
+            try:
+                return await fn(*args, **kwargs)
+            except LanePausedError:
+                raise
+            except FloodWaitError as e:
+                self._flood_wait(lane, e, attempt)
+                attempt += 1
+
+    async def iter_messages(self, client, peer, lane_name: str = "history", **kwargs):
+        """
+        client.iter_messages with one token per history page. After a flood wait the
+        iteration resumes below the last message it yielded.
+        """
+        lane = self.lanes[lane_name]
+        limit = kwargs.pop("limit", None)
+        last_id = None
+        yielded = 0
+        attempt = 0
+        while True:
+            resume = dict(kwargs)
+            if last_id is not None:
+                resume["offset_id"] = last_id
+                resume.pop("offset_date", None)
+            if limit is not None:
+                resume["limit"] = limit - yielded
+                if resume["limit"] <= 0:
+                    return
+
+            await lane.acquire()
+            try:
+                async for message in client.iter_messages(peer, **resume):
+                    yielded += 1
+                    last_id = message.id
+                    if yielded % HISTORY_PAGE_SIZE == 0:
+                        # The next message comes from a new page
+                        await lane.acquire()
+                    yield message
+                return
+            except LanePausedError:
+                raise
+            except FloodWaitError as e:
+                self._flood_wait(lane, e, attempt)
+                attempt += 1
+
+    def stats(self):
+        lanes = {name: lane.stats() for name, lane in self.lanes.items()}
+        return {
+            "lanes": lanes,
+            "total_wait_seconds": round(sum(l["throttle_seconds"] + l["flood_wait_seconds"] for l in lanes.values()), 2),
+        }
+
+
+telegram_limiter = TelegramRateLimiter()
@@ -1,6 +1,8 @@
 # telegram_utils.py
 import os
 import json
+import asyncio
+import threading
 import pandas as pd
 from dotenv import load_dotenv
 from telethon.sync import TelegramClient
@@ -8,9 +10,12 @@ from telethon.sessions import StringSession
 from datetime import datetime, timezone, timedelta
 import re
 from typing import Dict, List
+from post_parser import parse_posts, POST_PARSER_DEBUG
 from telegram_scheduler import TelegramScheduler
 from telethon.tl.functions.messages import SendMessageRequest, SendMediaRequest
-from telethon.tl.types import InputPeerChannel, InputMediaUploadedPhoto, InputMediaUploadedDocument
+from telethon.tl.types import InputPeerChannel, InputMediaUploadedPhoto, InputMediaUploadedDocument, InputMediaPhoto, InputPhoto, MessageMediaPhoto
+from telethon.errors import FileReferenceExpiredError
+from telethon import utils as telethon_utils
 import gspread
 from google.oauth2 import service_account
 import pytz
@@ -59,9 +64,82 @@ MAX_TEXT_LENGTH = 4096      # Telegram's message limit
 CAPTION_SAFETY_BUFFER = 50
 MESSAGE_DELAY_MINUTES = 3
 
+# --- Spreadsheet / worksheet handle cache ---
+# open_by_key and worksheet(title) each cost a metadata request; handles are
+# cached per process and filled from one fetch_sheet_metadata per spreadsheet.
+_spreadsheet_cache = {}   # sheet_id -> Spreadsheet
+_worksheet_cache = {}     # (sheet_id, title) -> Worksheet
+_sheet_cache_lock = threading.RLock()
+
+def clear_sheet_cache():
+    with _sheet_cache_lock:
+        _spreadsheet_cache.clear()
+        _worksheet_cache.clear()
+
+class _OpenedSpreadsheet(gspread.Spreadsheet):
+    """Spreadsheet that keeps the metadata it fetches when opened (gspread discards its sheet list)"""
+    opened_metadata = None
+
+    def fetch_sheet_metadata(self, params=None):
+        metadata = super().fetch_sheet_metadata(params)
+        if self.opened_metadata is None:
+            self.opened_metadata = metadata
+        return metadata
+
+def _load_worksheets(sh, metadata=None):
+    """Cache every worksheet of `sh` from one metadata response (fetched if not given)"""
+    if metadata is None:
+        metadata = sh.fetch_sheet_metadata()
+    for key in [k for k in _worksheet_cache if k[0] == sh.id]:
+        del _worksheet_cache[key]
+    for sheet_data in metadata["sheets"]:
+        ws = gspread.Worksheet(sh, sheet_data["properties"], sh.id, sh.client)
+        _worksheet_cache[(sh.id, ws.title)] = ws
+
+def get_spreadsheet(sheet_id: str = SHEET_ID):
+    """Cached gc.open_by_key; opening and listing its worksheets is one metadata request"""
+    with _sheet_cache_lock:
+        sh = _spreadsheet_cache.get(sheet_id)
+        if sh is None:
+            sh = _OpenedSpreadsheet(gc.http_client, {"id": sheet_id})
+            _spreadsheet_cache[sheet_id] = sh
+            _load_worksheets(sh, sh.opened_metadata)
+        return sh
+
+def get_worksheet(sheet_id: str, title: str, create_rows: int = None, create_cols: int = None):
+    """
+    Cached worksheet lookup by title.
+    A miss refreshes the spreadsheet metadata once; if the worksheet is still
+    missing it is created when create_rows/create_cols are given, otherwise
+    WorksheetNotFound is raised.
+    """
+    with _sheet_cache_lock:
+        key = (sheet_id, title)
+        ws = _worksheet_cache.get(key)
+        if ws is not None:
+            return ws
+
+        sh = get_spreadsheet(sheet_id)
+        ws = _worksheet_cache.get(key)
+        if ws is None:
+            # Added elsewhere since we last looked
+            _load_worksheets(sh)
+            ws = _worksheet_cache.get(key)
+        if ws is None:
+            if create_rows is None:
+                raise gspread.WorksheetNotFound(title)
+            ws = sh.add_worksheet(title=title, rows=create_rows, cols=create_cols or 10)
+            _worksheet_cache[key] = ws
+        return ws
+
+def invalidate_worksheet(sheet_id: str, title: str):
+    """Forget a cached worksheet (deleted/renamed on the Sheets side)"""
+    with _sheet_cache_lock:
+        _worksheet_cache.pop((sheet_id, title), None)
+
 def initialize_google_sheets():
     """Initialize Google Sheets connection securely without local service_account.json"""
-    global gc, sheet
+    global gc, sheet, sheets_available
     try:
         # ✅ Load credentials JSON from environment variable
         google_creds_json = os.getenv("GOOGLE_SERVICE_ACCOUNT_JSON")
@@ -72,7 +150,9 @@ def initialize_google_sheets():
         creds = service_account.Credentials.from_service_account_info(creds_dict, scopes=SCOPES)
 
         gc = gspread.authorize(creds)
-        workbook = gc.open_by_key(SHEET_ID)
+        clear_sheet_cache()
+        if "blocked_slots" in globals():
+            blocked_slots.invalidate()
 
         # ✅ Ensure each channel has its own sheet
         expected_headers = ["Post Number", "Category", "Date", "Time", "Status", "Message", "Channel"]
@@ -80,10 +160,10 @@ def initialize_google_sheets():
         for channel_id, channel_info in CHANNELS.items():
             sheet_name = channel_info['sheet_name']
             try:
-                channel_sheet = workbook.worksheet(sheet_name)
+                channel_sheet = get_worksheet(SHEET_ID, sheet_name)
             except gspread.WorksheetNotFound:
                 print(f"📄 Creating new sheet: {sheet_name}")
-                channel_sheet = workbook.add_worksheet(title=sheet_name, rows=1000, cols=10)
+                channel_sheet = get_worksheet(SHEET_ID, sheet_name, create_rows=1000, create_cols=10)
             
             # ✅ Ensure headers exist
             try:
@@ -97,22 +177,26 @@ def initialize_google_sheets():
                 channel_sheet.append_row(expected_headers)
         
         print("✅ Google Sheets connection successful for all channels")
+        sheets_available = True
         return True
 
     except Exception as e:
         print(f"❌ Google Sheets setup error: {e}")
+        sheets_available = False
         return False
 
 # Initialize sheets connection
 sheets_available = initialize_google_sheets()
 
 # --- Telegram Credentials ---
-api_id = int(os.getenv("TELEGRAM_API_ID"))
-api_hash = os.getenv("TELEGRAM_API_HASH")
-phone = os.getenv("TELEGRAM_PHONE_NUMBER")
-session_string = os.getenv("TELETHON_SESSION")
+# The shared connection lives in telegram_client; credentials are re-exported here for existing imports
+from telegram_client import client_manager, api_id, api_hash, phone, session_string
+from peer_cache import peer_cache
+from telegram_limiter import telegram_limiter
+from sheets_queue import SheetsWriteBehindQueue
+from status_journal import StatusJournal, SHEET_KEY, COLUMNS as STATUS_COLUMNS
+from blocked_slots import BlockedSlotIndex
 
-client = TelegramClient(StringSession(session_string), api_id, api_hash)
 scheduler = TelegramScheduler()
 
 
@@ -223,94 +307,11 @@ def split_long_message(message, max_length=4096):
     
     return chunks
 
-def extract_all_posts_from_texts(text_blocks: List[str]) -> Dict[int, str]:
+def extract_all_posts_from_texts(text_blocks: List[str], debug: bool = POST_PARSER_DEBUG) -> Dict[int, str]:
+    """Posts from each text block, parsed in one pass per block (see post_parser.PostParser)"""
     posts = {}
-
-    # Much more flexible pattern for post detection
-    # Matches: post-1, Post 1, **post-1**, post**-1**, POST_1, etc.
-    post_start_pattern = re.compile(
-        r'(?:^|\n)\s*(?:\*{0,2})\s*post\s*[-_\s]*(\d+)\s*(?:\*{0,2})\s*(?:\n|$)',
-        re.IGNORECASE | re.MULTILINE
-    )
-    
-    # End pattern - matches various end formats
-    post_end_pattern = re.compile(
-        r'(?:^|\n)\s*(?:\*{0,2})\s*post\s*[-_\s]*(\d+)\s*(?:end|copy|copies?|finish|done)\s*(?:\*{0,2})\s*(?:\n|$)',
-        re.IGNORECASE | re.MULTILINE
-    )
-
-    section_start_pattern = re.compile(r'AMZ_TELEGRAM', re.IGNORECASE)
-
-    # Enhanced time pattern - supports multiple formats
-    time_pattern = re.compile(
-        r'(?:^|\n)\s*time\s*[:\-=]\s*(\d{1,2}:\d{2}(?::\d{2})?)\s*(?:am|pm)?\s*(?:\n|$)',
-        re.IGNORECASE | re.MULTILINE
-    )
-
     for text in text_blocks:
-        # Start from "AMZ_TELEGRAM" if present
-        section_match = section_start_pattern.search(text)
-        if section_match:
-            text = text[section_match.end():]
-
-        # Find all post starts
-        start_matches = list(post_start_pattern.finditer(text))
-        
-        for i, start_match in enumerate(start_matches):
-            post_num = int(start_match.group(1))
-            start_pos = start_match.end()
-            
-            # Find the corresponding end for this post number
-            end_pos = len(text)  # Default to end of text
-            
-            # Look for specific end pattern for this post number
-            remaining_text = text[start_pos:]
-            specific_end_pattern = re.compile(
-                rf'(?:^|\n)\s*(?:\*{{0,2}})\s*post\s*[-_\s]*{post_num}\s*(?:end|copy|copies?|finish|done)\s*(?:\*{{0,2}})\s*(?:\n|$)',
-                re.IGNORECASE | re.MULTILINE
-            )
-            
-            end_match = specific_end_pattern.search(remaining_text)
-            if end_match:
-                end_pos = start_pos + end_match.start()
-            else:
-                # If no specific end found, use the next post start as boundary
-                if i + 1 < len(start_matches):
-                    next_start = start_matches[i + 1]
-                    end_pos = next_start.start()
-
-            content = text[start_pos:end_pos]
-            lines = content.splitlines()
-            category = None
-            custom_time = None
-            text_lines = []
-
-            for line in lines:
-                stripped = line.strip()
-                # Category check
-                if stripped.lower().startswith("category:"):
-                    category = stripped[len("category:"):].strip()
-                    continue
-                # Time check
-                time_match = time_pattern.search(line)
-                if time_match:
-                    custom_time = time_match.group(1)
-                    print(f"🕐 Found custom time for post {post_num}: {custom_time}")
-                    continue
-                # Keep line exactly (including blank lines)
-                text_lines.append(line)
-
-            clean_text = "\n".join(text_lines).rstrip()
-
-            
-            posts[post_num] = {
-                "category": category,
-                "text": clean_text,
-                "custom_time": custom_time  # New field for custom time
-            }
-            
-            print(f"📋 Extracted Post {post_num}: Category='{category}', CustomTime='{custom_time}', TextLength={len(clean_text)}")
-
+        posts.update(parse_posts(text, debug=debug))
     return posts
 
 def parse_custom_time(time_str: str, base_date: datetime) -> datetime:
@@ -431,9 +432,7 @@ def log_post_status_gsheet(post_number, category, status, schedule_time, message
         return
 
     try:
-        workbook = gc.open_by_key(SHEET_ID)
         sheet_name = CHANNELS[channel_id]['sheet_name']
-        channel_sheet = workbook.worksheet(sheet_name)
         
         # Format datetime consistently
         schedule_time = format_datetime_consistently(schedule_time)
@@ -467,47 +466,57 @@ def log_post_status_gsheet(post_number, category, status, schedule_time, message
         # Log to console for debugging
         print(f"📝 Logging: Post {post_number} | {category} | {date_str} {time_str} | {status}")
         
-        # Append to sheet
-        success = append_row_to_sheet_channel(channel_sheet, values)
-        
-        if not success:
-            log_post_status_local_fallback(post_number, category, status, schedule_time, message, channel_id)
+        # Queue for the background writer; the send path never waits on Sheets
+        sheets_queue.enqueue(sheet_name, [str(val).strip() if val is not None else "" for val in values])
+        blocked_slots.add(channel_id, local_time.replace(tzinfo=None))
             
     except Exception as e:
         print(f"❌ Error in log_post_status_gsheet: {e}")
         log_post_status_local_fallback(post_number, category, status, schedule_time, message, channel_id)
 
-def append_row_to_sheet_channel(channel_sheet, values):
-    """Append row to specific channel sheet with retry logic"""
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            # Ensure all values are strings and properly formatted
-            formatted_values = []
-            for val in values:
-                if val is None:
-                    formatted_values.append("")
-                else:
-                    formatted_values.append(str(val).strip())
-            
-            channel_sheet.append_row(formatted_values)
-            print(f"✅ Successfully logged to Google Sheets (attempt {attempt + 1})")
-            return True
-            
-        except Exception as e:
-            print(f"❌ Attempt {attempt + 1} failed to append row: {e}")
-            if attempt == max_retries - 1:
-                print("❌ All attempts failed to write to Google Sheets")
-                return False
-            
-            # Wait before retry
-            import time
-            time.sleep(2 ** attempt)  # Exponential backoff
-    
-    return False
+def flush_status_rows_to_sheet(sheet_name, rows):
+    """Append a batch of queued status rows to one channel worksheet (runs on the write-behind thread)"""
+    if not sheets_available or not gc:
+        return False
+
+    channel_sheet = get_worksheet(SHEET_ID, sheet_name)
+    try:
+        channel_sheet.append_rows(rows)
+    except gspread.exceptions.APIError:
+        # Handle may point at a deleted/recreated worksheet; look it up again next flush
+        invalidate_worksheet(SHEET_ID, sheet_name)
+        raise
+    print(f"✅ Flushed {len(rows)} status rows to Google Sheets '{sheet_name}'")
+    return True
+
+def log_status_rows_local_fallback(sheet_name, rows):
+    """Send rows the Sheets queue could not write to the local fallback log"""
+    local_rows = []
+    for row in rows:
+        local_rows.append(dict(zip(STATUS_COLUMNS, (list(row) + [""] * 7)[:7])))
+    write_local_log_rows(local_rows, sheet_name)
+
+def replay_status_journal():
+    """Push locally logged status rows into Google Sheets (once it is reachable again)"""
+    if not sheets_available or not gc:
+        return 0
+    return status_journal.replay(
+        flush_status_rows_to_sheet,
+        lambda row: [str(row.get(col, "")).strip() for col in STATUS_COLUMNS]
+    )
+
+# Registered before the Sheets queue so rows it drops at exit still reach the Excel export
+status_journal = StatusJournal()
+status_journal.register_atexit()
+
+sheets_queue = SheetsWriteBehindQueue(flush_status_rows_to_sheet, log_status_rows_local_fallback)
+sheets_queue.register_atexit()
+
+if sheets_available:
+    threading.Thread(target=replay_status_journal, name="status-journal-replay", daemon=True).start()
 
 def log_post_status_local_fallback(post_number, category, status, schedule_time, message, channel_id):
-    """Fallback logging to local Excel file if Google Sheets fails"""
+    """Fallback logging to the local status journal (logs/post_logs.jsonl) if Google Sheets fails"""
     try:
         # Format datetime consistently
         schedule_time = format_datetime_consistently(schedule_time)
@@ -528,24 +537,47 @@ def log_post_status_local_fallback(post_number, category, status, schedule_time,
             "Message": safe_truncate_text(message, 200),
             "Channel": CHANNELS.get(channel_id, {}).get('username', channel_id)
         }
+        write_local_log_rows([new_log], CHANNELS.get(channel_id, {}).get('sheet_name'))
+        
+    except Exception as e:
+        print(f"❌ Even fallback logging failed: {e}")
 
-        os.makedirs("logs", exist_ok=True)
-        excel_path = os.path.join("logs", "post_logs.xlsx")
-
-        if os.path.exists(excel_path):
-            df = pd.read_excel(excel_path)
-            df = pd.concat([df, pd.DataFrame([new_log])], ignore_index=True)
-        else:
-            df = pd.DataFrame([new_log])
-
-        df.to_excel(excel_path, index=False)
-        print(f"📁 Logged to local fallback file: {excel_path}")
+def write_local_log_rows(new_logs, sheet_name=None):
+    """Append status rows to the local journal; logs/post_logs.xlsx is exported from it in the background"""
+    try:
+        status_journal.append([{**new_log, SHEET_KEY: sheet_name} for new_log in new_logs])
+        print(f"📁 Logged {len(new_logs)} rows to local status journal: {status_journal.path}")
         
     except Exception as e:
         print(f"❌ Even fallback logging failed: {e}")
 
-def get_blocked_times_from_sheet(channel_ids=None):
-    """Return blocked times, optionally filtered by channel"""
+def fetch_status_slot_rows(channel_ids):
+    """Date/Time/Status columns of each channel status worksheet, fetched with one batch_get"""
+    sheet_names = {}
+    for channel_id in channel_ids:
+        sheet_name = CHANNELS[channel_id]['sheet_name']
+        try:
+            get_worksheet(SHEET_ID, sheet_name)
+            sheet_names[channel_id] = sheet_name
+        except gspread.WorksheetNotFound:
+            print(f"Sheet {sheet_name} not found, skipping")
+
+    if not sheet_names:
+        return {}
+
+    # Columns C:E are Date, Time, Status (headers enforced by initialize_google_sheets)
+    ranges = ["'{}'!C2:E".format(name.replace("'", "''")) for name in sheet_names.values()]
+    response = get_spreadsheet(SHEET_ID).values_batch_get(ranges)
+    value_ranges = response.get("valueRanges", [])
+    return {
+        channel_id: value_range.get("values", [])
+        for channel_id, value_range in zip(sheet_names, value_ranges)
+    }
+
+blocked_slots = BlockedSlotIndex(fetch_status_slot_rows)
+
+def get_blocked_times_from_sheet(channel_ids=None, start: datetime = None, end: datetime = None):
+    """Return blocked times, optionally filtered by channel and by the dates between start and end"""
     if not gc:
         print("⚠️ Google Sheets connection not available, trying to initialize...")
         if not initialize_google_sheets():
@@ -553,79 +585,113 @@ def get_blocked_times_from_sheet(channel_ids=None):
     
     blocked = []
     try:
-        workbook = gc.open_by_key(SHEET_ID)
         channels_to_check = channel_ids or list(CHANNELS.keys())
-        
-        for channel_id in channels_to_check:
-            sheet_name = CHANNELS[channel_id]['sheet_name']
-            try:
-                channel_sheet = workbook.worksheet(sheet_name)
-                records = channel_sheet.get_all_records()
-                
-                for rec in records:
-                    date = str(rec.get("Date", "")).strip()
-                    time = str(rec.get("Time", "")).strip()
-                    status = str(rec.get("Status", "")).strip()
-
-                    if not date or not time:
-                        continue
-
-                    if status:  # Any non-empty status means this time slot was used
-                        dt_str = f"{date} {time}"
-                        dt = None
-
-                        # Flexible parsing to match both logging styles
-                        formats = [
-                            "%Y-%m-%d %H:%M:%S",
-                            "%Y-%m-%d %H:%M",
-                            "%d/%m/%Y %H:%M:%S", 
-                            "%d/%m/%Y %H:%M",
-                            "%Y/%m/%d %H:%M:%S",
-                            "%Y/%m/%d %H:%M",
-                            "%m/%d/%Y %H:%M:%S",
-                            "%m/%d/%Y %H:%M",
-                        ]
-
-                        for fmt in formats:
-                            try:
-                                dt = datetime.strptime(dt_str, fmt)
-                                break
-                            except ValueError:
-                                continue
-
-                        if dt:
-                            blocked.append(dt)
-                            print(f"🚫 Blocked time slot found: {dt} (Status: {status}) from {sheet_name}")
-                        else:
-                            print(f"⚠️ Could not parse datetime: {dt_str}")
-                            
-            except gspread.WorksheetNotFound:
-                print(f"Sheet {sheet_name} not found, skipping")
-                continue
-                
+        blocked = blocked_slots.get(channels_to_check, start, end)
     except Exception as e:
         print(f"❌ Error reading blocked times: {e}")
     
     print(f"📊 Total blocked time slots found: {len(blocked)}")
     return blocked
     
-async def send_telegram_message(image_path: str, post_text: str, post_number: int, category: str, schedule_time: datetime, channel_username: str, channel_id: str):
-    """Send Telegram message with improved error handling and consistent logging"""
+# --- Media reuse: upload each image once per batch ---
+# Keyed by file identity (device, inode, size, mtime) so a replaced file is never served from cache.
+# Holds the uploaded InputFile until the first send, then the server-side InputPhoto.
+
+def _media_key(image_path: str):
+    # By inode: the same creative hardlinked into several upload workspaces is uploaded once
+    stat = os.stat(image_path)
+    return (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+def _as_input_media(handle):
+    if isinstance(handle, InputPhoto):
+        return InputMediaPhoto(id=handle)
+    return InputMediaUploadedPhoto(file=handle)
+
+class MediaUploadCache:
+    """
+    Upload handles for one scheduling batch. Each batch owns its cache, so batches
+    running at the same time (requests, background jobs) never clear each other's.
+    """
+
+    def __init__(self):
+        self._handles = {}
+        self._locks = {}
+
+    async def get_input_media(self, image_path: str):
+        """Return InputMedia for image_path, uploading the bytes only the first time"""
+        key = _media_key(image_path)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            handle = self._handles.get(key)
+            if handle is None:
+                client = await client_manager.get_client()
+                # By path, not an open handle: a retry after a flood wait must read the file from the start
+                handle = await telegram_limiter.call("upload", client.upload_file, image_path)
+                self._handles[key] = handle
+                print(f"📸 Image uploaded successfully: {image_path}")
+            else:
+                print(f"♻️ Reusing uploaded image: {image_path}")
+        return _as_input_media(handle)
+
+    def remember_sent_photo(self, image_path: str, result):
+        """Swap the cached upload for the InputPhoto Telegram created, so later sends skip the upload entirely"""
+        for update in getattr(result, 'updates', None) or []:
+            message = getattr(update, 'message', None)
+            media = getattr(message, 'media', None)
+            if isinstance(media, MessageMediaPhoto) and media.photo:
+                try:
+                    self._handles[_media_key(image_path)] = telethon_utils.get_input_photo(media.photo)
+                except (OSError, TypeError):
+                    pass
+                return
+
+    def forget(self, image_path: str):
+        try:
+            self._handles.pop(_media_key(image_path), None)
+        except OSError:
+            pass
+
+async def send_media_request(entity, image_path: str, input_media, message: str, schedule_date: datetime, media_cache: MediaUploadCache):
+    """SendMediaRequest that re-uploads once if a reused photo reference has expired"""
+    client = await client_manager.get_client()
     try:
-        if not client.is_connected():
-            await client.connect()
-        if not await client.is_user_authorized():
-            raise Exception("Telegram client not authorized")
+        result = await telegram_limiter.call("send", client, SendMediaRequest(
+            peer=entity,
+            media=input_media,
+            message=message,
+            schedule_date=schedule_date
+        ))
+    except FileReferenceExpiredError:
+        print(f"🔄 Photo reference expired, re-uploading {image_path}")
+        media_cache.forget(image_path)
+        result = await telegram_limiter.call("send", client, SendMediaRequest(
+            peer=entity,
+            media=await media_cache.get_input_media(image_path),
+            message=message,
+            schedule_date=schedule_date
+        ))
+    media_cache.remember_sent_photo(image_path, result)
+    return result
+
+async def send_telegram_message(image_path: str, post_text: str, post_number: int, category: str, schedule_time: datetime, channel_username: str, channel_id: str,
+                                media_cache: MediaUploadCache = None):
+    """
+    Send Telegram message with improved error handling and consistent logging.
+    Returns True once Telegram has accepted the post, False if nothing was scheduled.
+    Pass the batch's media_cache to upload each image once per batch.
+    """
+    if media_cache is None:
+        media_cache = MediaUploadCache()
+    try:
+        client = await client_manager.get_client()
 
-        entity = await client.get_entity(channel_username)
+        entity = await peer_cache.resolve(client, channel_username)
 
         media = None
         
         if image_path and os.path.exists(image_path):
             try:
-                with open(image_path, 'rb') as file:
-                    media = await client.upload_file(file)
-                print(f"📸 Image uploaded successfully: {image_path}")
+                media = await media_cache.get_input_media(image_path)
             except Exception as img_error:
                 print(f"⚠️ Failed to upload image {image_path}: {img_error}")
                 media = None
@@ -637,25 +703,27 @@ async def send_telegram_message(image_path: str, post_text: str, post_number: in
         if media and message:
             if caption_check["can_use_as_caption"]:
                 # Caption fits - send with image
-                input_media = InputMediaUploadedPhoto(file=media)
-                await client(SendMediaRequest(
-                    peer=entity,
-                    media=input_media,
+                await send_media_request(
+                    entity,
+                    image_path,
+                    media,
                     message=caption_check["safe_caption"],  # safe version
-                    schedule_date=schedule_time
-                ))
+                    schedule_date=schedule_time,
+                    media_cache=media_cache
+                )
                 print(f"✅ Sent image with caption for post {post_number} at {schedule_time}")
             
             else:
                 # Caption too long - new strategy:
                 # Step 1: Send image with NO caption
-                input_media = InputMediaUploadedPhoto(file=media)
-                await client(SendMediaRequest(
-                    peer=entity,
-                    media=input_media,
+                await send_media_request(
+                    entity,
+                    image_path,
+                    media,
                     message="",  # no caption
-                    schedule_date=schedule_time
-                ))
+                    schedule_date=schedule_time,
+                    media_cache=media_cache
+                )
                 print(f"📸 Sent image only (caption too long) at {schedule_time}")
 
                 # Step 2: Send full text after 1 min
@@ -664,7 +732,7 @@ async def send_telegram_message(image_path: str, post_text: str, post_number: in
 
                 for i, chunk in enumerate(text_chunks):
                     chunk_schedule_time = text_schedule_time + timedelta(seconds=i * 30)
-                    await client(SendMessageRequest(
+                    await telegram_limiter.call("send", client, SendMessageRequest(
                         peer=entity,
                         message=chunk,
                         schedule_date=chunk_schedule_time
@@ -674,26 +742,25 @@ async def send_telegram_message(image_path: str, post_text: str, post_number: in
                 # Log both separately
                 log_post_status_gsheet(post_number, category, "✅ Scheduled (Image only)", schedule_time, "", channel_id)
                 log_post_status_gsheet(f"{post_number}-text", category, "✅ Scheduled (Text)", text_schedule_time, message, channel_id)
-                log_post_status_gsheet(post_number, category, "⚠️ No Content", schedule_time, "No text or image provided", channel_id)
-                log_post_status_gsheet(post_number, category, "✅ Scheduled", schedule_time, message, channel_id)
-                log_post_status_gsheet(post_number, category, f"❌ {error_msg}", schedule_time, message or "", channel_id)
+                return True
 
   
         elif media:
             # Image only
-            input_media = InputMediaUploadedPhoto(file=media)
-            await client(SendMediaRequest(
-                peer=entity,
-                media=input_media,
+            await send_media_request(
+                entity,
+                image_path,
+                media,
                 message="",
-                schedule_date=schedule_time
-            ))
+                schedule_date=schedule_time,
+                media_cache=media_cache
+            )
             print(f"📤 Sent image only for post {post_number}")
         elif message:
             # Text only
             chunks = [message[i:i+MAX_TEXT_LENGTH] for i in range(0, len(message), MAX_TEXT_LENGTH)]
             for chunk in chunks:
-                await client(SendMessageRequest(
+                await telegram_limiter.call("send", client, SendMessageRequest(
                     peer=entity,
                     message=chunk,
                     schedule_date=schedule_time
@@ -702,16 +769,19 @@ async def send_telegram_message(image_path: str, post_text: str, post_number: in
         else:
             # Nothing to send
             print(f"⚠️ Nothing to send for post {post_number}")
-            log_post_status_gsheet(post_number, category, "⚠️ No Content", schedule_time, "No text or image provided")
-            return
+            log_post_status_gsheet(post_number, category, "⚠️ No Content", schedule_time, "No text or image provided", channel_id)
+            return False
 
         print(f"✅ Successfully scheduled post {post_number} at {schedule_time}")
         log_post_status_gsheet(post_number, category, "✅ Scheduled", schedule_time, message, channel_id)
+        return True
         
     except Exception as e:
         error_msg = f"Failed: {str(e)}"
         print(f"❌ Failed to schedule post {post_number}: {e}")
+        peer_cache.invalidate_on_error(channel_username, e)
         log_post_status_gsheet(post_number, category, f"❌ {error_msg}", schedule_time, message or "", channel_id)
+        return False
 
 def match_image_to_post(post_number: int, image_filenames: list[str]) -> str | None:
     """
@@ -857,7 +927,6 @@ def create_channel_date_worksheet(channel_name: str, date_str: str, headers: Lis
     try:
         # Get the correct sheet ID for this channel
         sheet_id = get_channel_sheet_id(channel_name)
-        sh = gc.open_by_key(sheet_id)
 
         # Convert "22_Sep_2025" → "22 Sep 2025"
         try:
@@ -874,16 +943,21 @@ def create_channel_date_worksheet(channel_name: str, date_str: str, headers: Lis
 
         # Check if worksheet already exists
         try:
-            ws = sh.worksheet(worksheet_name)
+            ws = get_worksheet(sheet_id, worksheet_name)
             print(f"📋 Worksheet '{worksheet_name}' already exists in sheet {sheet_id}")
             return ws
         except gspread.WorksheetNotFound:
             # Create new worksheet
-            ws = sh.add_worksheet(title=worksheet_name, rows=1000, cols=20)
+            ws = get_worksheet(sheet_id, worksheet_name, create_rows=1000, create_cols=20)
             ws.append_row(headers)
             print(f"✅ Created new worksheet: '{worksheet_name}'")
             return ws
 
+    except gspread.exceptions.APIError as e:
+        # Cached handle may point at a deleted/renamed worksheet; look it up again next time
+        invalidate_worksheet(sheet_id, worksheet_name)
+        print(f"❌ Worksheet creation error for {channel_name}: {e}")
+        return None
     except Exception as e:
         print(f"❌ Worksheet creation error for {channel_name}: {e}")
         return None
@@ -896,64 +970,42 @@ def create_channel_date_worksheet(channel_name: str, date_str: str, headers: Lis
 import os
 import requests
 
-API_URL = os.getenv("LINK_CLICKS_API")
-API_KEY = "f073c95a0227414d8e053fdfa19ece0dbe29ea9a8b3fb08e2c8186fabce64bb4"
+from click_client import API_URL, API_KEY, normalize_link, summarize_click_items, click_cache
 
 # telegram_utils.py - Updated with separate link columns and better formatting
 def get_click_data_for_links(links, date_str):
     """
     Return total clicks and per-link clicks for Telegram and WhatsApp.
     Sums all clicks from all unique links in a post.
+    Blocking version for sync callers; async code should use click_client.
     """
-    telegram_total = 0
-    whatsapp_total = 0
-    telegram_per_link = {}
-    whatsapp_per_link = {}
-    telegram_links = []
-    whatsapp_links = []
+    items_by_link = []
 
     # Ensure links are unique
     unique_links = list(set(links))
 
     for link in unique_links:
-        normalized_link = link.replace("http://", "").replace("https://", "")
+        normalized_link = normalize_link(link)
+        hit, data = click_cache.get(normalized_link, date_str)
+        if hit:
+            items_by_link.append((normalized_link, data))
+            continue
+
         headers = {"X-API-KEY": API_KEY, "Content-Type": "application/json"}
         payload = {"shortened_url": normalized_link, "date": date_str}
 
         try:
-            response = requests.post(API_URL, json=payload, headers=headers)
+            response = requests.post(API_URL, json=payload, headers=headers, timeout=10)
             response.raise_for_status()
             data = response.json()
+            click_cache.put(normalized_link, date_str, data)
         except Exception as e:
             print(f"⚠️ Error fetching clicks for {normalized_link}: {e}")
             continue
 
-        # API returns a list of clicks data for this link
-        for item in data:
-            acc = item.get("account")
-            clicks = int(item.get("clicks", 0))
-            shortened_url = item.get("shortened_url", normalized_link)
-
-            if acc == "telegram":
-                telegram_total += clicks
-                telegram_per_link[shortened_url] = clicks
-                if shortened_url not in telegram_links:
-                    telegram_links.append(shortened_url)
+        items_by_link.append((normalized_link, data))
 
-            elif acc == "whatsapp":
-                whatsapp_total += clicks
-                whatsapp_per_link[shortened_url] = clicks
-                if shortened_url not in whatsapp_links:
-                    whatsapp_links.append(shortened_url)
-
-    return {
-        "telegram_clicks": telegram_total,
-        "whatsapp_clicks": whatsapp_total,
-        "telegram_clicks_per_link": telegram_per_link,
-        "whatsapp_clicks_per_link": whatsapp_per_link,
-        "telegram_links": telegram_links,
-        "whatsapp_links": whatsapp_links
-    }
+    return summarize_click_items(items_by_link)
 
 def save_posts_to_channel_date_sheets(posts: list, channel: str, scheduled: bool = False):
     """
@@ -964,9 +1016,6 @@ def save_posts_to_channel_date_sheets(posts: list, channel: str, scheduled: bool
     if not posts:
         return "No posts to save."
 
-    sheet_id = get_channel_sheet_id(channel)
-    sh = gc.open_by_key(sheet_id)
-
     # Updated headers: removed Channel, added separate link columns
     headers = ["Post Number", "Category", "Time", "Status", "Message", 
                "Telegram Links", "WhatsApp Links", "Views", "Telegram Clicks", "WhatsApp Clicks"]
@@ -1024,7 +1073,16 @@ def save_posts_to_channel_date_sheets(posts: list, channel: str, scheduled: bool
     # Single batch append operation instead of multiple insert_row calls
     if all_rows:
         try:
-            ws.append_rows(all_rows, value_input_option='USER_ENTERED')
+            try:
+                ws.append_rows(all_rows, value_input_option='USER_ENTERED')
+            except gspread.exceptions.APIError as e:
+                # Cached handle of a worksheet deleted/renamed in Sheets: look it up (or recreate it) once
+                print(f"⚠️ Append to '{ws.title}' failed ({e}), refreshing worksheet handle")
+                invalidate_worksheet(ws.spreadsheet_id, ws.title)
+                ws = create_channel_date_worksheet(channel, post_date_str, headers, scheduled)
+                if not ws:
+                    raise
+                ws.append_rows(all_rows, value_input_option='USER_ENTERED')
             print(f"✅ Batch saved {len(all_rows)} posts to {channel} sheet '{ws.title}'")
         except Exception as e:
             print(f"❌ Error during batch save: {e}")
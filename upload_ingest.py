@@ -0,0 +1,54 @@
+# upload_ingest.py
+# Copy uploads to disk in fixed-size chunks, hashing them on the way, and parse
+# text files while they are being written instead of reading them back afterwards.
+
+import codecs
+import hashlib
+import io
+import os
+from post_parser import PostParser, POST_PARSER_DEBUG
+
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+
+
+async def save_upload(file, path: str, on_chunk=None):
+    """
+    Stream an UploadFile to `path`; memory use is one chunk whatever the file size.
+    on_chunk(bytes) sees every chunk. Returns {"path", "size", "sha256"}.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "wb") as f:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            f.write(chunk)
+            digest.update(chunk)
+            size += len(chunk)
+            if on_chunk is not None:
+                on_chunk(chunk)
+    return {"path": path, "size": size, "sha256": digest.hexdigest()}
+
+
+class TextPostStream:
+    """Decodes UTF-8 chunks like open(path, "r", encoding="utf-8") and feeds a PostParser"""
+
+    def __init__(self, debug: bool = POST_PARSER_DEBUG):
+        self.parser = PostParser(debug=debug)
+        # Universal newlines, as text-mode reads do
+        self._decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder("utf-8")(), translate=True)
+
+    def feed(self, chunk: bytes):
+        self.parser.feed(self._decoder.decode(chunk))
+
+    def close(self):
+        self.parser.feed(self._decoder.decode(b"", final=True))
+        return self.parser.close()
+
+
+async def save_text_upload(file, path: str, debug: bool = POST_PARSER_DEBUG):
+    """Stream a .txt upload to disk and parse it as it arrives; returns (stored, posts)"""
+    stream = TextPostStream(debug=debug)
+    stored = await save_upload(file, path, on_chunk=stream.feed)
+    return stored, stream.close()
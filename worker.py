@@ -1,12 +1,28 @@
 # worker.py
-from scheduler import scheduler
+from scheduler import scheduler, sweep_job_media, SCHEDULER_MISFIRE_GRACE_SECONDS
 import asyncio
+import os
+
+# Jobs added by other processes (the API) only reach the shared job store; the worker
+# re-reads it this often so they run on time instead of at its next own wakeup
+SCHEDULER_POLL_SECONDS = int(os.getenv("SCHEDULER_POLL_SECONDS", "10"))
+
+
+async def run_worker():
+    # Pending jobs load from the job store; missed ones within the grace period fire now
+    scheduler.start()
+    print(f"📦 {len(scheduler.get_jobs())} scheduled jobs loaded (misfire grace {SCHEDULER_MISFIRE_GRACE_SECONDS}s)")
+    scheduler.add_job(sweep_job_media, "interval", hours=6, id="sweep_job_media", replace_existing=True)
+    sweep_job_media()
+    while True:
+        await asyncio.sleep(SCHEDULER_POLL_SECONDS)
+        scheduler.wakeup()
+
 
 if __name__ == "__main__":
     try:
         print("🚀 Scheduler Worker Running...")
-        scheduler.start()
-        asyncio.get_event_loop().run_forever()
+        asyncio.run(run_worker())
     except (KeyboardInterrupt, SystemExit):
         print("🛑 Scheduler Worker Stopped")
 
@@ -0,0 +1,168 @@
+# workspaces.py
+# Per-request upload workspaces backed by a content-addressed blob store.
+# Each scheduling request gets uploads/<workspace>/ with its files hardlinked from
+# uploads/.blobs/<sha256><ext>, so identical creatives are stored once and concurrent
+# requests never touch each other's files. A background reaper removes old workspaces.
+
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime
+from fastapi.staticfiles import StaticFiles
+from upload_ingest import save_upload, TextPostStream
+from post_parser import POST_PARSER_DEBUG
+from app_state import PeriodicReaper
+
+WORKSPACE_TTL_SECONDS = int(os.getenv("WORKSPACE_TTL_SECONDS", str(6 * 3600)))
+WORKSPACE_REAP_INTERVAL_SECONDS = int(os.getenv("WORKSPACE_REAP_INTERVAL_SECONDS", "600"))
+BLOBS_DIRNAME = ".blobs"
+
+
+class UploadWorkspace:
+    def __init__(self, root: str, blob_dir: str, blob_lock: threading.Lock):
+        self.id = f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}"
+        self.path = os.path.join(root, self.id)
+        self.blob_dir = blob_dir
+        self._blob_lock = blob_lock
+        os.makedirs(self.path, exist_ok=True)
+
+    def file_path(self, filename: str) -> str:
+        return os.path.join(self.path, os.path.basename(filename))
+
+    def _commit(self, stored, filename: str):
+        """Move a freshly written upload into the blob store and link it into the workspace"""
+        ext = os.path.splitext(filename)[1].lower()
+        blob = os.path.join(self.blob_dir, f"{stored['sha256']}{ext}")
+        target = self.file_path(filename)
+        if os.path.exists(target):
+            os.remove(target)
+
+        # Held against the reaper's blob sweep: an existing blob must not vanish before it is linked
+        with self._blob_lock:
+            if os.path.exists(blob):
+                os.remove(stored["path"])
+            else:
+                os.replace(stored["path"], blob)
+            try:
+                os.link(blob, target)
+            except OSError:
+                shutil.copyfile(blob, target)
+        return {**stored, "path": target, "blob": blob}
+
+    async def save(self, file, on_chunk=None):
+        """Stream an UploadFile into the workspace; returns {"path", "size", "sha256", "blob"}"""
+        tmp_path = os.path.join(self.path, f".{uuid.uuid4().hex}.part")
+        try:
+            stored = await save_upload(file, tmp_path, on_chunk=on_chunk)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return self._commit(stored, file.filename)
+
+    async def save_text(self, file, debug: bool = POST_PARSER_DEBUG):
+        """Like save(), parsing the text as it arrives; returns (stored, posts)"""
+        stream = TextPostStream(debug=debug)
+        stored = await self.save(file, on_chunk=stream.feed)
+        return stored, stream.close()
+
+
+class WorkspaceManager(PeriodicReaper):
+    reaper_name = "Upload workspace reaper"
+
+    def __init__(self, root: str, ttl_seconds=WORKSPACE_TTL_SECONDS, reap_interval=WORKSPACE_REAP_INTERVAL_SECONDS):
+        self.root = root
+        self.blob_dir = os.path.join(root, BLOBS_DIRNAME)
+        self.ttl_seconds = ttl_seconds
+        self.reap_interval = reap_interval
+        self._active = set()
+        self._lock = threading.Lock()
+        self._blob_lock = threading.Lock()
+        os.makedirs(self.blob_dir, exist_ok=True)
+
+    def create(self) -> UploadWorkspace:
+        workspace = UploadWorkspace(self.root, self.blob_dir, self._blob_lock)
+        with self._lock:
+            self._active.add(workspace.id)
+        return workspace
+
+    def release(self, workspace: UploadWorkspace):
+        """Request finished; the TTL counts from now"""
+        with self._lock:
+            self._active.discard(workspace.id)
+        try:
+            os.utime(workspace.path)
+        except OSError:
+            pass
+
+    def reap(self) -> int:
+        """Remove idle workspaces older than the TTL, then blobs no workspace links to"""
+        cutoff = time.time() - self.ttl_seconds
+        removed = 0
+        with self._lock:
+            active = set(self._active)
+
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name == BLOBS_DIRNAME or name in active:
+                continue
+            try:
+                if os.path.getmtime(path) >= cutoff:
+                    continue
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)  # files from before workspaces existed
+                removed += 1
+            except OSError as e:
+                print(f"⚠️ Could not remove upload workspace {name}: {e}")
+
+        for name in os.listdir(self.blob_dir):
+            path = os.path.join(self.blob_dir, name)
+            try:
+                with self._blob_lock:
+                    stat = os.stat(path)
+                    if stat.st_nlink <= 1 and stat.st_mtime < cutoff:
+                        os.remove(path)
+            except OSError:
+                continue
+
+        if removed:
+            print(f"🧹 Removed {removed} expired upload workspaces")
+        return removed
+
+    def find_latest(self, filename: str):
+        """Path of `filename` in the newest workspace that has it (ids sort by creation time)"""
+        for name in sorted(os.listdir(self.root), reverse=True):
+            if name.startswith("."):
+                continue
+            path = os.path.join(self.root, name, filename)
+            if os.path.isfile(path):
+                return path
+        return None
+
+
+class WorkspaceStaticFiles(StaticFiles):
+    """
+    Serves uploads/<workspace>/<file>, plus the pre-workspace URLs uploads/<file> from the
+    newest workspace holding that file. Dot paths (the blob store, partial uploads) are never served.
+    """
+
+    def __init__(self, manager: WorkspaceManager, **kwargs):
+        super().__init__(directory=manager.root, **kwargs)
+        self.manager = manager
+
+    def lookup_path(self, path: str):
+        parts = [part for part in path.replace(os.sep, "/").split("/") if part and part != "."]
+        if not parts or any(part.startswith(".") for part in parts):
+            return "", None
+        if len(parts) == 1:
+            found = self.manager.find_latest(parts[0])
+            if found is not None:
+                try:
+                    return found, os.stat(found)
+                except OSError:
+                    return "", None
+        return super().lookup_path(path)